@@ -0,0 +1,168 @@
+"""Measures Client performance against the synthetic server in
+fakeserver.py: listing throughput, recursive state fetch time, model
+conversion cost, download throughput and, with --memory, peak memory.
+
+    python benchmarks/client.py [--objects N] [--files N] [--depth N]
+        [--fanout N] [--latency MS] [--file-size BYTES] [--downloads N]
+        [--only NAME ...] [--memory] [--json]
+
+Peak memory comes from tracemalloc, so only Python allocations are
+counted. Tracing slows allocation-heavy code considerably, so with --memory
+each benchmark is run a second time with tracing on, and the timings come
+from the first run.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ocflindex  # noqa: E402
+from fakeserver import Server  # noqa: E402
+
+
+# set by --memory
+TRACE_MEMORY = False
+
+
+def measure(fn, unit: str = "items") -> dict:
+    """runs fn, which returns the number of items (or bytes, if unit is
+    "bytes") it handled, and returns the elapsed time and the rate (and,
+    with TRACE_MEMORY, the peak traced memory of a second run).
+    """
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    if unit == "bytes":
+        result = {"seconds": elapsed, "bytes": count, "mib_per_second": count / elapsed / (1 << 20)}
+    else:
+        result = {"seconds": elapsed, "items": count, "items_per_second": count / elapsed}
+    if TRACE_MEMORY:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_mib"] = peak / (1 << 20)
+    return result
+
+
+def listing(srv: Server, args) -> dict:
+    results = {}
+    for label, validate, kwargs in [("validated", True, {}),
+                                    ("fast", False, {}),
+                                    ("raw", False, {"raw": True}),
+                                    ("fast_prefetch", False, {"prefetch": 2})]:
+        with ocflindex.Client(srv.grpc_url, validate=validate) as client:
+            results[label] = measure(lambda: sum(1 for _ in client.list_objects(**kwargs)))
+    with ocflindex.Client(srv.grpc_url, validate=False) as client:
+        # the fake server's ids are numbered after a common prefix
+        results["fast_parallel"] = measure(lambda: sum(1 for _ in client.list_objects_parallel(
+            prefix="ark:/99999/", alphabet="0123456789", ordered=False)))
+    return results
+
+
+def state(srv: Server, args) -> dict:
+    object_id = srv.fake.ids[0]
+    results = {}
+    for label, validate, method, kwargs in [("get_validated", True, "get_object_state", {}),
+                                            ("get_fast", False, "get_object_state", {}),
+                                            ("get_raw", False, "get_object_state", {"raw": True}),
+                                            ("iter_fast", False, "iter_object_state", {}),
+                                            ("iter_fast_prefetch", False, "iter_object_state", {"prefetch": 2})]:
+        with ocflindex.Client(srv.grpc_url, validate=validate) as client:
+            def run() -> int:
+                result = getattr(client, method)(object_id, recursive=True, **kwargs)
+                if method == "get_object_state":
+                    return len(result.children)
+                return sum(1 for _ in result)
+            results[label] = measure(run)
+    with ocflindex.Client(srv.grpc_url, validate=False) as client:
+        results["walk_fast"] = measure(
+            lambda: sum(len(files) for _, _, files in client.walk_object_state(object_id)))
+    return results
+
+
+def conversion(srv: Server, args) -> dict:
+    # time spent building models, reported by the client's instrumentation
+    results = {}
+    for label, validate in [("validated", True), ("fast", False)]:
+        stats = ocflindex.Stats()
+        with ocflindex.Client(srv.grpc_url, validate=validate, metrics=stats) as client:
+            for _ in client.list_objects():
+                pass
+            for _ in client.iter_object_state(srv.fake.ids[0], recursive=True):
+                pass
+        for kind, (n, seconds) in stats.conversions.items():
+            results[f"{label}_{kind}"] = {"items": n, "us_per_item": seconds / n * 1e6}
+    return results
+
+
+def download(srv: Server, args) -> dict:
+    digests = list(srv.fake.blobs)[:args.downloads]
+    size = len(srv.fake.blobs[digests[0]])
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, ocflindex.Client(srv.grpc_url) as client:
+        client.download_base_url = srv.http_url
+
+        def stream() -> int:
+            return sum(len(b) for d in digests for b in client.content_stream(d, chunk_size=1 << 16))
+
+        def files(parts: int):
+            def run() -> int:
+                return sum(client.download(d, os.path.join(tmp, f"{d}.{parts}"), parts=parts,
+                                           part_size=max(1 << 16, size // parts))
+                           for d in digests)
+            return run
+
+        def export() -> int:
+            result = client.export_version(srv.fake.ids[0], "", os.path.join(tmp, "export"))
+            return result.bytes_downloaded
+
+        results["content_stream"] = measure(stream, "bytes")
+        results["download_1_part"] = measure(files(1), "bytes")
+        results["download_4_parts"] = measure(files(4), "bytes")
+        results["export_version"] = measure(export, "bytes")
+    return results
+
+
+BENCHMARKS = {"listing": listing, "state": state, "conversion": conversion, "download": download}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--objects", type=int, default=20_000)
+    parser.add_argument("--files", type=int, default=20_000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="per-request latency (ms)")
+    parser.add_argument("--file-size", type=int, default=1 << 20)
+    parser.add_argument("--downloads", type=int, default=16)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    global TRACE_MEMORY
+    TRACE_MEMORY = args.memory
+
+    results = {}
+    with Server(objects=args.objects, files=args.files, depth=args.depth, fanout=args.fanout,
+                file_size=args.file_size, blobs=max(args.downloads, 1),
+                latency=args.latency / 1000) as srv:
+        for name in args.only or BENCHMARKS:
+            results[name] = BENCHMARKS[name](srv, args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, group in results.items():
+        print(name)
+        for label, r in group.items():
+            cols = [f"{k} {v:,.2f}" if isinstance(v, float) else f"{k} {v:,}" for k, v in r.items()]
+            print(f"  {label:22} " + "  ".join(cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""A synthetic, in-process ocfl-index server for benchmarks: an
+IndexService on a local gRPC port and a download endpoint (with range
+support) on a local HTTP port.
+
+Every object has the same synthetic state: files files spread over a
+directory tree depth levels deep with fanout subdirectories per level.
+Content is drawn from blobs distinct blocks of file_size bytes. Each RPC
+and HTTP request is delayed by latency seconds.
+"""
+import bisect
+import hashlib
+import threading
+import time
+
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import grpc
+
+from ocfl.v1 import index_pb2 as pb2
+from ocfl.v1 import index_pb2_grpc as api
+
+
+class FakeIndex(api.IndexServiceServicer):
+    def __init__(self, objects: int = 10_000, files: int = 10_000, depth: int = 2, fanout: int = 10,
+                 file_size: int = 64 << 10, blobs: int = 64, latency: float = 0.0,
+                 max_page_size: int = 1000) -> None:
+        self.ids = [f"ark:/99999/{i:08d}" for i in range(objects)]
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.calls: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.blobs: dict[str, bytes] = {}
+        digests = []
+        for i in range(blobs):
+            data = hashlib.shake_256(str(i).encode()).digest(file_size)
+            digest = hashlib.sha512(data).hexdigest()
+            self.blobs[digest] = data
+            digests.append(digest)
+        # path -> (digest, size), sorted by path
+        self.files = {}
+        for i in range(files):
+            dirs = [f"d{(i // fanout ** k) % fanout}" for k in range(depth)]
+            self.files["/".join(dirs + [f"f{i:08d}.bin"])] = (digests[i % blobs], file_size)
+        self.paths = sorted(self.files)
+        # directory path ("" for the root) -> sorted child items, and the
+        # directory's own digest and size
+        self.dirs: dict[str, list] = {}
+        self.dir_info: dict[str, pb2.GetObjectStateResponse.Item] = {}
+        self.__buildDirs("")
+
+    def __buildDirs(self, base: str) -> pb2.GetObjectStateResponse.Item:
+        prefix = base + "/" if base else ""
+        names: dict[str, Optional[tuple[str, int]]] = {}
+        for path in self.__under(prefix):
+            rest = path[len(prefix):]
+            if "/" in rest:
+                names[rest.split("/", 1)[0]] = None
+            else:
+                names[rest] = self.files[path]
+        items = []
+        for name in sorted(names):
+            if names[name] is None:
+                sub = self.__buildDirs(prefix + name)
+                items.append(pb2.GetObjectStateResponse.Item(
+                    name=name, isdir=True, digest=sub.digest, size=sub.size, has_size=True))
+            else:
+                digest, size = names[name]
+                items.append(pb2.GetObjectStateResponse.Item(name=name, digest=digest, size=size, has_size=True))
+        self.dirs[base] = items
+        h = hashlib.sha512()
+        for item in items:
+            h.update(f"{item.name}\0{item.digest}\0".encode())
+        info = pb2.GetObjectStateResponse.Item(isdir=True, digest=h.hexdigest(),
+                                               size=sum(i.size for i in items), has_size=True)
+        self.dir_info[base] = info
+        return info
+
+    def __under(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self.paths, prefix)
+        end = bisect.bisect_left(self.paths, prefix + "\U0010ffff")
+        return self.paths[start:end]
+
+    def _call(self, name: str) -> None:
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _page(self, token: str, page_size: int) -> tuple[int, int]:
+        start = int(token or 0)
+        size = min(page_size or self.max_page_size, self.max_page_size)
+        return start, start + size
+
+    def GetStatus(self, request, context):
+        self._call("GetStatus")
+        return pb2.GetStatusResponse(status="ok", num_object_paths=len(self.ids),
+                                     num_inventories=len(self.ids))
+
+    def IndexAll(self, request, context):
+        self._call("IndexAll")
+        return pb2.IndexAllResponse()
+
+    def IndexIDs(self, request, context):
+        self._call("IndexIDs")
+        return pb2.IndexIDsResponse()
+
+    def ListObjects(self, request, context):
+        self._call("ListObjects")
+        lo = bisect.bisect_left(self.ids, request.id_prefix)
+        hi = bisect.bisect_left(self.ids, request.id_prefix + "\U0010ffff")
+        start, end = self._page(request.page_token, request.page_size)
+        resp = pb2.ListObjectsResponse()
+        for object_id in self.ids[lo + start:min(lo + end, hi)]:
+            obj = resp.objects.add(object_id=object_id, head="v1")
+            obj.v1_created.FromSeconds(1600000000)
+            obj.head_created.FromSeconds(1600000000)
+        if lo + end < hi:
+            resp.next_page_token = str(end)
+        return resp
+
+    def GetObject(self, request, context):
+        self._call("GetObject")
+        i = bisect.bisect_left(self.ids, request.object_id)
+        if i == len(self.ids) or self.ids[i] != request.object_id:
+            context.abort(grpc.StatusCode.NOT_FOUND, "object not found")
+        resp = pb2.GetObjectResponse(object_id=request.object_id, spec="1.1",
+                                     root_path=f"objects/{i:08d}", digest_algorithm="sha512")
+        version = resp.versions.add(num="v1", message="synthetic", size=sum(s for _, s in self.files.values()),
+                                    has_size=True)
+        version.user.name = "benchmark"
+        version.created.FromSeconds(1600000000)
+        return resp
+
+    def GetObjectState(self, request, context):
+        self._call("GetObjectState")
+        base = "" if request.base_path in (".", "") else request.base_path.strip("/")
+        if base not in self.dirs:
+            context.abort(grpc.StatusCode.NOT_FOUND, "path not found")
+        if request.recursive:
+            prefix = base + "/" if base else ""
+            paths = self.__under(prefix)
+            start, end = self._page(request.page_token, request.page_size)
+            items = [pb2.GetObjectStateResponse.Item(name=p[len(prefix):], digest=self.files[p][0],
+                                                     size=self.files[p][1], has_size=True)
+                     for p in paths[start:end]]
+            total = len(paths)
+        else:
+            start, end = self._page(request.page_token, request.page_size)
+            items = self.dirs[base][start:end]
+            total = len(self.dirs[base])
+        info = self.dir_info[base]
+        resp = pb2.GetObjectStateResponse(digest=info.digest, isdir=True, size=info.size, has_size=True)
+        resp.children.extend(items)
+        if end < total:
+            resp.next_page_token = str(end)
+        return resp
+
+    def FollowLogs(self, request, context):
+        self._call("FollowLogs")
+        yield pb2.FollowLogsResponse(message="synthetic index has no tasks")
+
+
+class Server:
+    """Runs a FakeIndex on local gRPC and HTTP ports until stop is called
+    (or the with block ends). grpc_url is the url for ocflindex.Client and
+    http_url its download_base_url.
+    """
+    def __init__(self, workers: int = 32, **kwargs) -> None:
+        self.fake = FakeIndex(**kwargs)
+        self.grpc = grpc.server(futures.ThreadPoolExecutor(max_workers=workers),
+                                options=[("grpc.max_send_message_length", 64 << 20)])
+        api.add_IndexServiceServicer_to_server(self.fake, self.grpc)
+        port = self.grpc.add_insecure_port("127.0.0.1:0")
+        self.grpc.start()
+        self.grpc_url = f"http://127.0.0.1:{port}"
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self.fake))
+        self.http.daemon_threads = True
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.http_url = f"http://127.0.0.1:{self.http.server_address[1]}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def stop(self) -> None:
+        self.http.shutdown()
+        self.http.server_close()
+        self.grpc.stop(0)
+
+
+def _handler(fake: FakeIndex):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_HEAD(self):
+            self.__respond(body=False)
+
+        def do_GET(self):
+            self.__respond(body=True)
+
+        def __respond(self, body: bool) -> None:
+            if fake.latency:
+                time.sleep(fake.latency)
+            data = fake.blobs.get(self.path.rsplit("/", 1)[-1])
+            if data is None:
+                self.send_error(404)
+                return
+            start, end = 0, len(data) - 1
+            rng = self.headers.get("Range")
+            if rng is not None and rng.startswith("bytes="):
+                first, _, last = rng.removeprefix("bytes=").partition("-")
+                start = int(first)
+                end = min(int(last), end) if last else end
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            if body:
+                self.wfile.write(data[start:end + 1])
+
+    return Handler
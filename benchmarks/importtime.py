@@ -0,0 +1,49 @@
+"""Measures the time to import ocflindex and its main entry points in a
+fresh interpreter, and which heavy dependencies each one loads.
+
+    python benchmarks/importtime.py [runs]
+
+Each statement is run in runs new interpreters; the median time over the
+time for an empty interpreter is reported. For a per-module breakdown,
+use python -X importtime -c "import ocflindex".
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+STATEMENTS = [
+    "import ocflindex",
+    "from ocflindex import Client",
+    "from ocflindex import Client; Client('http://localhost:1').close()",
+    "from ocflindex import models",
+    "from ocflindex import AsyncClient",
+    "import ocflindex.cli",
+]
+HEAVY = ["grpc", "google.protobuf", "requests", "pydantic", "sqlite3", "aiohttp", "pyarrow"]
+
+_REPORT = "import sys; print(' '.join(m for m in {heavy!r} if m in sys.modules))"
+
+
+def run(statement: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def main(runs: int = 10) -> None:
+    baseline = statistics.median(run("pass") for _ in range(runs))
+    print(f"{'interpreter':70} {baseline * 1000:7.1f} ms")
+    for statement in STATEMENTS:
+        try:
+            elapsed = statistics.median(run(statement) for _ in range(runs)) - baseline
+        except subprocess.CalledProcessError:
+            print(f"{statement:70} failed")
+            continue
+        loaded = subprocess.run([sys.executable, "-c", f"{statement}\n" + _REPORT.format(heavy=HEAVY)],
+                                check=True, capture_output=True, text=True).stdout.strip()
+        print(f"{statement:70} {elapsed * 1000:7.1f} ms   loads: {loaded or '-'}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,48 @@
+"""Compares validated (from_orm) and fast (construct) model building for
+synthetic ListObjects and GetObjectState pages.
+
+    python benchmarks/models.py [num_items]
+"""
+import sys
+import time
+
+from ocfl.v1 import index_pb2 as pb2
+from ocflindex.models import VALIDATED, FAST
+
+
+def list_page(n: int) -> pb2.ListObjectsResponse:
+    resp = pb2.ListObjectsResponse()
+    for i in range(n):
+        obj = resp.objects.add(object_id=f"ark:/12345/{i:08d}", head="v3")
+        obj.v1_created.FromSeconds(1600000000 + i)
+        obj.head_created.FromSeconds(1700000000 + i)
+    return resp
+
+
+def state_page(n: int) -> pb2.GetObjectStateResponse:
+    resp = pb2.GetObjectStateResponse(digest="ab" * 64, isdir=True, size=n * 1024, has_size=True)
+    for i in range(n):
+        resp.children.add(name=f"data/file-{i:08d}.txt", digest=f"{i:0128x}", size=1024, has_size=True)
+    return resp
+
+
+def timed(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return time.perf_counter() - start
+
+
+def main(n: int = 100_000) -> None:
+    objects = list_page(n).objects
+    children = state_page(n).children
+    for label, items, attr in [("object_list_item", objects, "object_list_item"),
+                               ("object_state_child", children, "object_state_child")]:
+        slow = timed(getattr(VALIDATED, attr), items)
+        fast = timed(getattr(FAST, attr), items)
+        print(f"{label:20} validated {slow / n * 1e6:7.2f} us/item   "
+              f"fast {fast / n * 1e6:7.2f} us/item   speedup {slow / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
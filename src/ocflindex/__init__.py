@@ -1,112 +1,123 @@
-import requests
-import grpc
-import sys
+"""Python client for ocfl-index.
 
-from ocfl.v1 import index_pb2 as pb2
-from ocfl.v1 import index_pb2_grpc as api
-from ocflindex.models import Status, Object, ObjectState, ObjectStateChild, ObjectListItem
-from typing import Optional, Iterable
+Names are imported from their modules on first use (see __getattr__), so
+that importing the package does not load grpc, requests or pydantic.
+"""
+import importlib
 
-class ObjectListIterator:
-    def __init__(self, api, page_size=1000, prefix=""):
-        self.api = api
-        self.next_page_token = ""
-        self.page_size=page_size
-        self.prefix=prefix
-        self.offset=0
-        self.objects=[]
-        self.__getObjects()
+from typing import TYPE_CHECKING, Any
 
-    def __iter__(self):
-        return self
-    
-    def __next__(self):
-        if self.offset >= len(self.objects) and self.next_page_token != "":
-                self.offset = 0
-                self.__getObjects()
-        if self.offset >= len(self.objects):
-            raise StopIteration
-        item = self.objects[self.offset]
-        self.offset += 1
-        return ObjectListItem.from_orm(item)
-    
-    def __getObjects(self):
-        req = pb2.ListObjectsRequest(page_token = self.next_page_token, 
-                                    page_size=self.page_size, 
-                                    id_prefix=self.prefix)
-        resp = self.api.ListObjects(req)
-        self.objects = resp.objects
-        self.next_page_token = resp.next_page_token
+# public name -> module that defines it
+_EXPORTS = {
+    "Client": "client",
+    "ObjectListIterator": "client",
+    "AsyncClient": "aio",
+    "Status": "models",
+    "Object": "models",
+    "ObjectState": "models",
+    "ObjectStateChild": "models",
+    "ObjectListItem": "models",
+    "VALIDATED": "models",
+    "FAST": "models",
+    "Builders": "builders",
+    "RAW": "builders",
+    "projection": "builders",
+    "timed": "builders",
+    "pydantic_builders": "builders",
+    "ObjectResult": "bulk",
+    "ReindexResult": "bulk",
+    "DEFAULT_CONCURRENCY": "bulk",
+    "DEFAULT_REINDEX_BATCH": "bulk",
+    "DEFAULT_REINDEX_CONCURRENCY": "bulk",
+    "ColumnBatch": "columnar",
+    "download_url": "download",
+    "stream_url": "download",
+    "DigestError": "download",
+    "DEFAULT_PARTS": "download",
+    "DEFAULT_PART_SIZE": "download",
+    "export_version": "export",
+    "ExportResult": "export",
+    "diff_versions": "diff",
+    "FileChange": "diff",
+    "BlobCache": "blobs",
+    "MetadataCache": "cache",
+    "MemoryCache": "cache",
+    "RetryPolicy": "retry",
+    "DEFAULT_RETRY": "retry",
+    "Recorder": "metrics",
+    "Stats": "metrics",
+    "PrometheusRecorder": "metrics",
+    "MetricsInterceptor": "metrics",
+    "ChannelOptions": "channels",
+    "ChannelPool": "channels",
+    "PooledStub": "channels",
+    "open_channel": "channels",
+    "ROUND_ROBIN": "channels",
+    "LEAST_LOADED": "channels",
+    "DEFAULT_HTTP_POOL_SIZE": "channels",
+    "HedgePolicy": "replicas",
+    "Replica": "replicas",
+    "ReplicaSet": "replicas",
+    "ReplicaStub": "replicas",
+    "READ_METHODS": "replicas",
+    "DEFAULT_HEALTH_INTERVAL": "replicas",
+    "ObjectStatePager": "paging",
+    "DEFAULT_STATE_PAGE_SIZE": "paging",
+    "MAX_STATE_PAGE_SIZE": "paging",
+    "Change": "sync",
+    "SnapshotEntry": "sync",
+    "SnapshotWriter": "sync",
+    "diff_snapshots": "sync",
+    "read_snapshot": "sync",
+    "prefix_shards": "shards",
+    "split_shards": "shards",
+    "Shard": "shards",
+    "list_sharded": "shards",
+    "list_adaptive": "shards",
+    "IncompleteListing": "shards",
+    "DEFAULT_SHARD_ALPHABET": "shards",
+}
 
-class Client:
-    def __init__(self, url: str,
-                 client_key: Optional[str] = None,
-                 client_cert: Optional[str] = None) -> None:
-        self.download_base_url = url
-        if url.startswith("https://"):
-            credentials: grpc.ssl_channel_credentials
-            if client_cert is not None and client_key is not None:
-                cert = open(client_cert, "rb").read()
-                key = open(client_key, "rb").read()
-                credentials = grpc.ssl_channel_credentials(private_key=key, certificate_chain=cert)
-            else:
-                credentials = grpc.ssl_channel_credentials()
-            self.srv_addr = url.removeprefix("https://")
-            self.channel = grpc.secure_channel(self.srv_addr, credentials=credentials)
-        elif url.startswith("http://"):
-            self.srv_addr = url.removeprefix("http://")
-            self.channel = grpc.insecure_channel(self.srv_addr)
-        else:
-            raise Exception("client url should begin with 'http://' or 'https://'")
-        self.api = api.IndexServiceStub(self.channel)
-        self.session = requests.Session()
-        self.session.cert = (client_cert, client_key)
+_SUBMODULES = frozenset([
+    "aio", "blobs", "builders", "bulk", "cache", "channels", "cli", "client", "columnar", "diff",
+    "download", "export", "metrics", "models", "paging", "replicas", "retry", "shards", "sync",
+])
 
-    def __enter__(self):
-        return self
+__all__ = sorted(_EXPORTS)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        return self.channel.__exit__(exc_type, exc_val, exc_tb)
 
-    def close(self):
-        return self.channel.close()
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is not None:
+        value = getattr(importlib.import_module(f"ocflindex.{module}"), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f"ocflindex.{name}")
+    else:
+        raise AttributeError(f"module 'ocflindex' has no attribute {name!r}")
+    globals()[name] = value
+    return value
 
-    def get_status(self) -> Status:
-        resp = self.api.GetStatus(pb2.GetStatusRequest())
-        return Status.from_orm(resp)
 
-    def get_object(self, object_id: str) -> Object:
-        obj =  self.api.GetObject(pb2.GetObjectRequest(object_id=object_id))
-        print(obj)
-        return Object.from_orm(obj)
-   
-    def get_object_state(self, object_id: str, path: str = ".", version: str = "", recursive: bool = False) -> ObjectState:
-        req = pb2.GetObjectStateRequest(
-            object_id=object_id,
-            base_path = path,
-            version = version,
-            recursive = recursive,
-            page_token="",
-            page_size=1)
-        resp = self.api.GetObjectState(req)
-        next_page_token = resp.next_page_token
-        state = ObjectState.from_orm(resp)
-        while next_page_token != "":
-            req.page_token = next_page_token
-            resp = self.api.GetObjectState(req)
-            next_page_token = resp.next_page_token
-            for ch in resp.children:
-                state.children.append(ObjectStateChild.from_orm(ch))
-        return state
-       
-    def list_objects(self, prefix: str ="") -> ObjectListIterator:
-        return ObjectListIterator(self.api, prefix=prefix)
-    
-    def content_stream(self, digest: str, **kwargs) -> None:
-        """makes a request to download the content with the given digest, returning
-        an iterator over the response data. 
-        """
-        with self.session.get(f"{self.download_base_url}/download/{digest}", stream=True) as r:
-            for b in r.iter_content(**kwargs):
-                yield b
-        
\ No newline at end of file
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
+
+
+if TYPE_CHECKING:
+    from ocflindex.client import Client, ObjectListIterator
+    from ocflindex.aio import AsyncClient
+    from ocflindex.models import Status, Object, ObjectState, ObjectStateChild, ObjectListItem, VALIDATED, FAST
+    from ocflindex.builders import Builders, RAW, projection, timed, pydantic_builders
+    from ocflindex.bulk import ObjectResult, ReindexResult, DEFAULT_CONCURRENCY, DEFAULT_REINDEX_BATCH, DEFAULT_REINDEX_CONCURRENCY
+    from ocflindex.columnar import ColumnBatch
+    from ocflindex.download import download_url, stream_url, DigestError, DEFAULT_PARTS, DEFAULT_PART_SIZE
+    from ocflindex.export import export_version, ExportResult
+    from ocflindex.diff import diff_versions, FileChange
+    from ocflindex.blobs import BlobCache
+    from ocflindex.cache import MetadataCache, MemoryCache
+    from ocflindex.retry import RetryPolicy, DEFAULT_RETRY
+    from ocflindex.metrics import Recorder, Stats, PrometheusRecorder, MetricsInterceptor
+    from ocflindex.channels import ChannelOptions, ChannelPool, PooledStub, open_channel, ROUND_ROBIN, LEAST_LOADED, DEFAULT_HTTP_POOL_SIZE
+    from ocflindex.replicas import HedgePolicy, Replica, ReplicaSet, ReplicaStub, READ_METHODS, DEFAULT_HEALTH_INTERVAL
+    from ocflindex.paging import ObjectStatePager, DEFAULT_STATE_PAGE_SIZE, MAX_STATE_PAGE_SIZE
+    from ocflindex.sync import Change, SnapshotEntry, SnapshotWriter, diff_snapshots, read_snapshot
+    from ocflindex.shards import prefix_shards, split_shards, Shard, list_sharded, list_adaptive, IncompleteListing, DEFAULT_SHARD_ALPHABET
@@ -0,0 +1,206 @@
+"""asyncio client for ocfl-index, built on grpc.aio channels. Downloads with
+AsyncClient.content_stream require aiohttp (pip install ocflindex[aio]).
+"""
+from __future__ import annotations
+
+import asyncio
+import grpc
+import ssl
+
+from ocfl.v1 import index_pb2 as pb2
+from ocfl.v1 import index_pb2_grpc as api
+from ocflindex.builders import Builders, pydantic_builders
+from ocflindex.retry import RetryPolicy, IncompleteRead, DEFAULT_RETRY
+from ocflindex.channels import ChannelOptions, open_channel
+from ocflindex.paging import ObjectStatePager, DEFAULT_STATE_PAGE_SIZE, MAX_STATE_PAGE_SIZE
+from typing import TYPE_CHECKING, Optional, AsyncIterator
+
+if TYPE_CHECKING:
+    from ocflindex.models import Status, Object, ObjectState, ObjectStateChild
+
+
+class AsyncObjectStatePager(ObjectStatePager):
+    """Async version of ObjectStatePager, using the same page sizing rules.
+    """
+    async def __aiter__(self) -> AsyncIterator[pb2.GetObjectStateResponse]:
+        req = self._firstRequest()
+        while True:
+            req.page_size = self.page_size
+            try:
+                resp = await self.api.GetObjectState(req)
+            except grpc.RpcError as err:
+                if self._shrink(err):
+                    continue
+                raise
+            more = self._advance(req, resp)
+            yield resp
+            if not more:
+                return
+
+
+class AsyncObjectListIterator:
+    def __init__(self, api, page_size=1000, prefix="", models: Optional[Builders] = None):
+        self.api = api
+        self.models = models if models is not None else pydantic_builders(True)
+        self.next_page_token = ""
+        self.page_size=page_size
+        self.prefix=prefix
+        self.offset=0
+        self.objects=[]
+        self.started=False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.offset >= len(self.objects) and (not self.started or self.next_page_token != ""):
+            await self.__getObjects()
+        if self.offset >= len(self.objects):
+            raise StopAsyncIteration
+        item = self.objects[self.offset]
+        self.offset += 1
+        return self.models.object_list_item(item)
+
+    async def __getObjects(self):
+        req = pb2.ListObjectsRequest(page_token = self.next_page_token,
+                                    page_size=self.page_size,
+                                    id_prefix=self.prefix)
+        resp = await self.api.ListObjects(req)
+        self.started = True
+        self.offset = 0
+        self.objects = resp.objects
+        self.next_page_token = resp.next_page_token
+
+
+class AsyncClient:
+    """asyncio counterpart to ocflindex.Client. All RPCs share one grpc.aio
+    channel, so many calls can be in flight on the same event loop. See
+    Client for the validate, retry and channel_options options.
+    """
+    def __init__(self, url: str,
+                 client_key: Optional[str] = None,
+                 client_cert: Optional[str] = None,
+                 validate: bool = True,
+                 retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+                 channel_options: Optional[ChannelOptions] = None) -> None:
+        self.download_base_url = url
+        self.validate = validate
+        self.__models: Optional[Builders] = None
+        self.client_key = client_key
+        self.client_cert = client_cert
+        self.retry = retry
+        interceptors = [retry.aio_interceptor()] if retry is not None else None
+        self.srv_addr, self.channel = open_channel(url, client_key, client_cert, channel_options,
+                                                   asyncio=True, interceptors=interceptors)
+        self.api = api.IndexServiceStub(self.channel)
+        self.session = None
+
+    @property
+    def models(self) -> Builders:
+        if self.__models is None:
+            self.__models = pydantic_builders(self.validate)
+        return self.__models
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        await self.channel.close()
+
+    async def get_status(self) -> Status:
+        resp = await self.api.GetStatus(pb2.GetStatusRequest())
+        return self.models.status(resp)
+
+    async def get_object(self, object_id: str) -> Object:
+        obj = await self.api.GetObject(pb2.GetObjectRequest(object_id=object_id))
+        return self.models.object(obj)
+
+    async def get_object_state(self, object_id: str, path: str = ".", version: str = "", recursive: bool = False,
+                               page_size: int = DEFAULT_STATE_PAGE_SIZE,
+                               max_page_size: int = MAX_STATE_PAGE_SIZE) -> ObjectState:
+        state = None
+        async for resp in self.__statePages(object_id, path, version, recursive, page_size, max_page_size):
+            if state is None:
+                state = self.models.object_state(resp)
+                continue
+            for ch in resp.children:
+                state.children.append(self.models.object_state_child(ch))
+        return state
+
+    async def iter_object_state(self, object_id: str, path: str = ".", version: str = "", recursive: bool = False,
+                                page_size: int = DEFAULT_STATE_PAGE_SIZE,
+                                max_page_size: int = MAX_STATE_PAGE_SIZE) -> AsyncIterator[ObjectStateChild]:
+        async for resp in self.__statePages(object_id, path, version, recursive, page_size, max_page_size):
+            for ch in resp.children:
+                yield self.models.object_state_child(ch)
+
+    def list_objects(self, prefix: str = "") -> AsyncObjectListIterator:
+        return AsyncObjectListIterator(self.api, prefix=prefix, models=self.models)
+
+    async def content_stream(self, digest: str, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+        """makes a request to download the content with the given digest,
+        returning an async iterator over the response data. As with
+        Client.content_stream, failed requests are retried according to the
+        client's retry policy, and a transfer that fails part way through
+        resumes with a range request from the last byte yielded.
+        """
+        session = self.__session()
+        import aiohttp
+        url = f"{self.download_base_url}/download/{digest}"
+        retry = self.retry or RetryPolicy(max_attempts=1, timeout=None)
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=retry.timeout)
+        offset = 0
+        attempt = 0
+        while True:
+            headers = {"Accept-Encoding": "identity"}
+            if offset > 0:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                async with session.get(url, headers=headers, timeout=timeout) as r:
+                    r.raise_for_status()
+                    if offset > 0 and r.status != 206:
+                        raise IOError(f"{url}: server ignored range request")
+                    expected = r.content_length
+                    if r.headers.get("Content-Encoding", "identity") != "identity":
+                        expected = None
+                    start = offset
+                    async for b in r.content.iter_chunked(chunk_size):
+                        offset += len(b)
+                        yield b
+                    if expected is not None and offset - start < expected:
+                        raise IncompleteRead(f"{url}: incomplete response")
+                    return
+            except Exception as err:
+                attempt += 1
+                if attempt >= retry.max_attempts or not retry.retryable(err):
+                    raise
+            await asyncio.sleep(retry.backoff(attempt - 1))
+
+    def __statePages(self, object_id: str, path: str, version: str, recursive: bool,
+                     page_size: int, max_page_size: int) -> AsyncObjectStatePager:
+        req = pb2.GetObjectStateRequest(
+            object_id=object_id,
+            base_path = path,
+            version = version,
+            recursive = recursive)
+        return AsyncObjectStatePager(self.api, req, page_size=page_size, max_page_size=max_page_size)
+
+    def __session(self):
+        if self.session is None:
+            try:
+                import aiohttp
+            except ImportError as err:
+                raise ImportError("AsyncClient.content_stream requires aiohttp: pip install ocflindex[aio]") from err
+            connector = None
+            if self.client_cert is not None and self.client_key is not None:
+                ctx = ssl.create_default_context()
+                ctx.load_cert_chain(self.client_cert, self.client_key)
+                connector = aiohttp.TCPConnector(ssl=ctx)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
@@ -0,0 +1,211 @@
+"""A local, content-addressed cache for downloaded content.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from ocflindex.download import new_hash, _remove
+from typing import BinaryIO, Iterator, Optional
+
+# default size limit for a BlobCache (10 GiB)
+DEFAULT_BLOB_BYTES = 10 << 30
+# fraction of max_bytes that an over-full cache is evicted down to
+DEFAULT_LOW_WATER = 0.9
+# temporary files older than this (seconds) are left from failed writes
+_STALE_TMP = 24 * 60 * 60
+
+
+class BlobCache:
+    """Caches content by digest in directory, as files named
+    <algorithm>/<digest[:2]>/<digest>. Content is only added after it has
+    been verified against its digest, and files are moved into place
+    atomically, so several processes may share the same directory. When the
+    cache grows past max_bytes, the least recently used files are removed
+    until it is under low_water times max_bytes, so that the cache
+    directory is only scanned once for every few inserts. digest_algorithm
+    is used when a caller does not give one.
+    """
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_BLOB_BYTES,
+                 digest_algorithm: str = "sha512",
+                 low_water: float = DEFAULT_LOW_WATER) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.digest_algorithm = digest_algorithm
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.tmpdir = os.path.join(directory, "tmp")
+        os.makedirs(self.tmpdir, exist_ok=True)
+        self.__cleanTmp()
+        self.size = sum(size for _, _, size in self.__scan())
+
+    def path(self, digest: str, digest_algorithm: Optional[str] = None) -> str:
+        algorithm = (digest_algorithm or self.digest_algorithm).lower()
+        digest = digest.lower()
+        return os.path.join(self.directory, algorithm, digest[:2], digest)
+
+    def get(self, digest: str, digest_algorithm: Optional[str] = None) -> Optional[str]:
+        """returns the path of the cached file for digest, or None. The file
+        is marked as recently used.
+        """
+        path = self.path(digest, digest_algorithm)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def open(self, digest: str, digest_algorithm: Optional[str] = None) -> Optional[BinaryIO]:
+        path = self.get(digest, digest_algorithm)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            # evicted by another process
+            return None
+
+    def stream(self, digest: str, digest_algorithm: Optional[str] = None,
+               chunk_size: int = 1 << 16) -> Optional[Iterator[bytes]]:
+        """returns an iterator over the cached content, or None."""
+        f = self.open(digest, digest_algorithm)
+        if f is None:
+            return None
+        return _read_chunks(f, chunk_size)
+
+    def copy_to(self, digest: str, dest: str, digest_algorithm: Optional[str] = None) -> bool:
+        """copies the cached content to dest (using the kernel's file copy
+        where available). Returns False if digest is not cached.
+        """
+        path = self.get(digest, digest_algorithm)
+        if path is None:
+            return False
+        tmp = dest + ".part"
+        try:
+            shutil.copyfile(path, tmp)
+        except FileNotFoundError:
+            return False
+        os.replace(tmp, dest)
+        return True
+
+    def put_file(self, digest: str, src: str, digest_algorithm: Optional[str] = None) -> None:
+        """adds a copy of src, which must already be verified, to the cache.
+        """
+        path = self.path(digest, digest_algorithm)
+        if os.path.exists(path):
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.tmpdir)
+        os.close(fd)
+        try:
+            shutil.copyfile(src, tmp)
+            self._commit(tmp, path)
+        except BaseException:
+            _remove(tmp)
+            raise
+
+    def writer(self, digest: str, digest_algorithm: Optional[str] = None) -> "BlobWriter":
+        """returns a BlobWriter that adds content for digest as it is
+        written.
+        """
+        algorithm = digest_algorithm or self.digest_algorithm
+        return BlobWriter(self, digest, algorithm)
+
+    def evict(self, max_bytes: Optional[int] = None) -> None:
+        """removes least recently used files until the cache is under
+        max_bytes (default: the cache's max_bytes).
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        with self.lock:
+            entries = sorted(self.__scan(), key=lambda e: e[1])
+            self.size = sum(size for _, _, size in entries)
+            for path, _, size in entries:
+                if self.size <= max_bytes:
+                    break
+                _remove(path)
+                self.size -= size
+
+    def _commit(self, tmp: str, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp, path)
+        with self.lock:
+            self.size += os.path.getsize(path)
+            over = self.size > self.max_bytes
+        if over:
+            self.evict(int(self.max_bytes * self.low_water))
+
+    def __cleanTmp(self) -> None:
+        now = time.time()
+        for name in os.listdir(self.tmpdir):
+            path = os.path.join(self.tmpdir, name)
+            try:
+                if now - os.stat(path).st_mtime > _STALE_TMP:
+                    _remove(path)
+            except FileNotFoundError:
+                continue
+
+    def __scan(self) -> Iterator[tuple[str, float, int]]:
+        # (path, mtime, size) for each cached file
+        for root, dirs, files in os.walk(self.directory):
+            if root == self.directory and "tmp" in dirs:
+                dirs.remove("tmp")
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+
+class BlobWriter:
+    """Writes content for a digest to a temporary file in the cache. On
+    commit, the content is checked against the digest and, if it matches,
+    atomically moved into the cache. Otherwise (or on discard) the temporary
+    file is removed.
+    """
+    def __init__(self, cache: BlobCache, digest: str, digest_algorithm: str) -> None:
+        self.cache = cache
+        self.digest = digest.lower()
+        self.digest_algorithm = digest_algorithm
+        self.hash = new_hash(digest_algorithm)
+        fd, self.tmp = tempfile.mkstemp(dir=cache.tmpdir)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, b: bytes) -> None:
+        self.hash.update(b)
+        self.file.write(b)
+
+    def commit(self) -> bool:
+        """adds the content to the cache, returning False if it did not match
+        the digest.
+        """
+        self.file.close()
+        if self.hash.hexdigest() != self.digest:
+            _remove(self.tmp)
+            return False
+        try:
+            self.cache._commit(self.tmp, self.cache.path(self.digest, self.digest_algorithm))
+        except BaseException:
+            _remove(self.tmp)
+            raise
+        return True
+
+    def discard(self) -> None:
+        self.file.close()
+        _remove(self.tmp)
+
+
+def _read_chunks(f: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    with f:
+        while True:
+            b = f.read(chunk_size)
+            if not b:
+                return
+            yield b
+
@@ -0,0 +1,62 @@
+"""Functions that turn protobuf messages into the values returned by the
+clients. The pydantic builders (models.VALIDATED and models.FAST) are in
+models; this module does not import pydantic, so raw and projected results
+don't need it.
+"""
+from operator import attrgetter
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Sequence
+
+if TYPE_CHECKING:
+    from ocflindex.models import Status, Object, ObjectState, ObjectStateChild, ObjectListItem
+
+
+class Builders(NamedTuple):
+    """Functions used by the clients to build models from protobuf messages
+    """
+    status: Callable[[Any], "Status"]
+    object: Callable[[Any], "Object"]
+    object_state: Callable[[Any], "ObjectState"]
+    object_state_child: Callable[[Any], "ObjectStateChild"]
+    object_list_item: Callable[[Any], "ObjectListItem"]
+
+def _raw(msg: Any) -> Any:
+    return msg
+
+# no conversion: the clients return protobuf messages as received
+RAW = Builders(
+    status=_raw,
+    object=_raw,
+    object_state=_raw,
+    object_state_child=_raw,
+    object_list_item=_raw)
+
+def projection(fields: Sequence[str]) -> Callable[[Any], tuple]:
+    """Returns a function that extracts the named fields from a protobuf
+    message as a tuple, without any conversion.
+    """
+    if len(fields) == 1:
+        getter = attrgetter(fields[0])
+        return lambda msg: (getter(msg),)
+    return attrgetter(*fields)
+
+def timed(builders: Builders, record: Callable[[str, float], None]) -> Builders:
+    """Returns builders that call record(kind, seconds) with the time each
+    conversion took, where kind is the Builders field name (e.g.,
+    "object_list_item").
+    """
+    def wrap(kind: str, build: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        def timed_build(msg: Any) -> Any:
+            start = perf_counter()
+            result = build(msg)
+            record(kind, perf_counter() - start)
+            return result
+        return timed_build
+    return Builders(*(wrap(kind, build) for kind, build in zip(Builders._fields, builders)))
+
+def pydantic_builders(validate: bool = True) -> Builders:
+    """Returns models.VALIDATED or, if validate is False, models.FAST. This
+    imports pydantic.
+    """
+    from ocflindex import models
+    return models.VALIDATED if validate else models.FAST
@@ -0,0 +1,114 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, NamedTuple, Optional, TypeVar
+
+if TYPE_CHECKING:
+    from ocflindex.models import Object, ObjectState
+
+T = TypeVar("T")
+
+# default number of concurrent calls for bulk operations
+DEFAULT_CONCURRENCY = 16
+# default number of ids per IndexIDs call in Client.reindex
+DEFAULT_REINDEX_BATCH = 500
+# default number of concurrent IndexIDs calls in Client.reindex. Each call
+# does storage I/O on the server, so this is lower than DEFAULT_CONCURRENCY.
+DEFAULT_REINDEX_CONCURRENCY = 4
+# limit on the encoded size of the ids in one IndexIDs request, well under
+# gRPC's default 4 MiB message limit
+MAX_BATCH_BYTES = 1 << 20
+
+
+class ObjectResult(NamedTuple):
+    """Result for one id in Client.get_objects. If the lookup failed, error is
+    set and object (and state) are None.
+    """
+    object_id: str
+    object: Optional["Object"] = None
+    state: Optional["ObjectState"] = None
+    error: Optional[BaseException] = None
+
+
+class ReindexResult(NamedTuple):
+    """Result for one IndexIDs call made by Client.reindex. If the call
+    failed, error is set and none of object_ids should be assumed indexed.
+    """
+    object_ids: list[str]
+    error: Optional[BaseException] = None
+
+
+def batched(ids: Iterable[str], size: int = DEFAULT_REINDEX_BATCH,
+            max_bytes: int = MAX_BATCH_BYTES) -> Iterator[list[str]]:
+    """groups ids into lists of up to size ids whose combined encoded length
+    is at most max_bytes (a single longer id is its own batch). ids is
+    consumed lazily.
+    """
+    batch: list[str] = []
+    nbytes = 0
+    for object_id in ids:
+        # field tag and length prefix
+        n = len(object_id.encode()) + 3
+        if batch and (len(batch) >= size or nbytes + n > max_bytes):
+            yield batch
+            batch = []
+            nbytes = 0
+        batch.append(object_id)
+        nbytes += n
+    if batch:
+        yield batch
+
+
+def fan_out(fn: Callable[[T], Any], items: Iterable[T],
+            concurrency: int = DEFAULT_CONCURRENCY,
+            ordered: bool = True) -> Iterator[tuple[T, Any, Optional[BaseException]]]:
+    """Calls fn for each item using a pool of concurrency threads, yielding
+    (item, result, error) tuples in input order or, if ordered is False, as
+    calls complete. items is consumed lazily: at most 2 * concurrency calls
+    are queued at a time. Exceptions raised by fn are returned as error
+    rather than raised.
+    """
+    concurrency = max(1, concurrency)
+    window = 2 * concurrency
+    items = iter(items)
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def submit() -> Optional[Future]:
+        for item in items:
+            fut = pool.submit(fn, item)
+            fut.item = item
+            return fut
+        return None
+
+    def done(fut: Future) -> tuple[T, Any, Optional[BaseException]]:
+        err = fut.exception()
+        if err is not None:
+            return fut.item, None, err
+        return fut.item, fut.result(), None
+
+    try:
+        if ordered:
+            queued: deque = deque()
+            while True:
+                while len(queued) < window:
+                    fut = submit()
+                    if fut is None:
+                        break
+                    queued.append(fut)
+                if not queued:
+                    return
+                yield done(queued.popleft())
+        else:
+            running: set = set()
+            while True:
+                while len(running) < window:
+                    fut = submit()
+                    if fut is None:
+                        break
+                    running.add(fut)
+                if not running:
+                    return
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    yield done(fut)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
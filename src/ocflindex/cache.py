@@ -0,0 +1,369 @@
+"""Caches for ocfl-index metadata: a persistent SQLite-backed cache
+(MetadataCache) and an in-process memoization cache (MemoryCache).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from ocfl.v1 import index_pb2 as pb2
+from ocflindex.blobs import DEFAULT_LOW_WATER
+from typing import Any, Callable, Hashable, Iterator, Optional
+
+# default size limit for a MetadataCache (1 GiB)
+DEFAULT_CACHE_BYTES = 1 << 30
+# default time (seconds) a cached GetObject response is used without
+# revalidation
+DEFAULT_OBJECT_TTL = 300.0
+# cache hits whose access times are held in memory before they are written
+_MAX_TOUCHED = 256
+# entries considered per eviction query
+_EVICT_BATCH = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    object_id TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS states (
+    key TEXT PRIMARY KEY,
+    pages INTEGER,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state_pages (
+    key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (key, page)
+);
+CREATE INDEX IF NOT EXISTS objects_accessed ON objects (accessed);
+CREATE INDEX IF NOT EXISTS states_accessed ON states (accessed);
+"""
+
+
+class MetadataCache:
+    """A persistent cache of GetObject and GetObjectState responses, stored
+    in a SQLite database in directory (which is created if necessary).
+
+    The state of an object version never changes, so GetObjectState pages
+    for an explicit version are kept until evicted. GetObject responses are
+    fresh for ttl seconds after they are stored, or for as long as the
+    object's head matches a head value given by the caller (e.g., from
+    list_objects). When the cache grows past max_bytes, the least recently
+    used entries are evicted until it is under low_water times max_bytes.
+    Access times of cache hits are written in batches, so the order of
+    eviction is approximate.
+
+    The cache may be shared by threads and by processes using the same
+    directory.
+    """
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_BYTES,
+                 ttl: float = DEFAULT_OBJECT_TTL,
+                 low_water: float = DEFAULT_LOW_WATER) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "metadata.sqlite")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.low_water = low_water
+        # access times of cache hits that are not yet written
+        self.touched_objects: dict[str, float] = {}
+        self.touched_states: dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                  isolation_level=None)
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            # with WAL, a crash can lose the last commits but not corrupt
+            # the database, which is fine for a cache
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(_SCHEMA)
+            self.size = self.__totalSize()
+            self.__evict()
+
+    def close(self) -> None:
+        with self.lock:
+            self.__flushTouched()
+            self.db.close()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute("DELETE FROM objects")
+            self.db.execute("DELETE FROM states")
+            self.db.execute("DELETE FROM state_pages")
+            self.db.execute("COMMIT")
+            self.touched_objects.clear()
+            self.touched_states.clear()
+            self.size = 0
+
+    def get_object(self, object_id: str, head: Optional[str] = None) -> Optional[pb2.GetObjectResponse]:
+        """returns the cached GetObject response for object_id if it is
+        fresh: if head is given, the cached object's head must match;
+        otherwise it must be newer than the cache's ttl.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT data, stored FROM objects WHERE object_id = ?",
+                                  (object_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            obj = pb2.GetObjectResponse.FromString(row[0])
+            if head is not None:
+                fresh = len(obj.versions) > 0 and obj.versions[-1].num == head
+            else:
+                fresh = time.time() - row[1] < self.ttl
+            if not fresh:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.touched_objects[object_id] = time.time()
+            self.__touched()
+            return obj
+
+    def put_object(self, obj: pb2.GetObjectResponse) -> None:
+        data = obj.SerializeToString()
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            old = self.db.execute("SELECT size FROM objects WHERE object_id = ?",
+                                  (obj.object_id,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)",
+                            (obj.object_id, data, len(data), now, now))
+            self.db.execute("COMMIT")
+            self.size += len(data) - (old[0] if old else 0)
+            self.__evict()
+
+    def state_pages(self, object_id: str, version: str, path: str,
+                    recursive: bool) -> Optional[Iterator[pb2.GetObjectStateResponse]]:
+        """returns an iterator over the cached GetObjectState pages for the
+        query, or None if they are not cached. If the entry is evicted while
+        it is being read, the iterator raises KeyError.
+        """
+        key = _state_key(object_id, version, path, recursive)
+        with self.lock:
+            row = self.db.execute("SELECT pages FROM states WHERE key = ? AND pages IS NOT NULL",
+                                  (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.touched_states[key] = time.time()
+            self.__touched()
+        return self.__readPages(key, row[0])
+
+    def cache_state_pages(self, object_id: str, version: str, path: str, recursive: bool,
+                          pages: Iterator[pb2.GetObjectStateResponse]) -> Iterator[pb2.GetObjectStateResponse]:
+        """stores pages in the cache as they are consumed from the returned
+        iterator. The entry becomes visible once the last page is stored;
+        if the iterator is not consumed to the end, the stored pages are
+        removed.
+        """
+        key = _state_key(object_id, version, path, recursive)
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.__deleteState(key)
+            self.db.execute("INSERT INTO states VALUES (?, NULL, 0, ?)", (key, time.time()))
+            self.db.execute("COMMIT")
+        num = 0
+        caching = True
+        complete = False
+        try:
+            for resp in pages:
+                if caching:
+                    caching = self.__putPage(key, num, resp)
+                num += 1
+                yield resp
+            if not caching:
+                return
+            with self.lock:
+                self.db.execute("UPDATE states SET pages = ?, accessed = ? WHERE key = ?",
+                                (num, time.time(), key))
+                complete = True
+                self.__evict()
+        finally:
+            if caching and not complete:
+                with self.lock:
+                    self.db.execute("BEGIN IMMEDIATE")
+                    # only the incomplete entry: another call may have
+                    # replaced it
+                    row = self.db.execute("SELECT 1 FROM states WHERE key = ? AND pages IS NULL",
+                                          (key,)).fetchone()
+                    if row is not None:
+                        self.__deleteState(key)
+                    self.db.execute("COMMIT")
+
+    def __putPage(self, key: str, num: int, resp: pb2.GetObjectStateResponse) -> bool:
+        # returns False if the entry was evicted before it was complete
+        data = resp.SerializeToString()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            cur = self.db.execute("UPDATE states SET size = size + ? WHERE key = ?", (len(data), key))
+            if cur.rowcount == 0:
+                self.db.execute("DELETE FROM state_pages WHERE key = ?", (key,))
+                self.db.execute("COMMIT")
+                return False
+            self.db.execute("INSERT OR REPLACE INTO state_pages VALUES (?, ?, ?)", (key, num, data))
+            self.db.execute("COMMIT")
+            self.size += len(data)
+            self.__evict()
+        return True
+
+    def __readPages(self, key: str, num: int) -> Iterator[pb2.GetObjectStateResponse]:
+        for i in range(num):
+            with self.lock:
+                row = self.db.execute("SELECT data FROM state_pages WHERE key = ? AND page = ?",
+                                      (key, i)).fetchone()
+            if row is None:
+                raise KeyError(key)
+            yield pb2.GetObjectStateResponse.FromString(row[0])
+
+    def __deleteState(self, key: str) -> None:
+        row = self.db.execute("SELECT size FROM states WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.size -= row[0]
+        self.db.execute("DELETE FROM states WHERE key = ?", (key,))
+        self.db.execute("DELETE FROM state_pages WHERE key = ?", (key,))
+
+    def __evict(self) -> None:
+        # caller holds self.lock
+        if self.size <= self.max_bytes:
+            return
+        self.__flushTouched()
+        target = int(self.max_bytes * self.low_water)
+        self.db.execute("BEGIN IMMEDIATE")
+        # other processes may have changed the cache
+        self.size = self.__totalSize()
+        while self.size > target:
+            # the least recently used entries, read through the accessed
+            # indexes
+            rows = self.db.execute("""
+                SELECT kind, key, size FROM (
+                    SELECT * FROM (SELECT 'object' AS kind, object_id AS key, size, accessed
+                                   FROM objects ORDER BY accessed LIMIT ?)
+                    UNION ALL
+                    SELECT * FROM (SELECT 'state', key, size, accessed
+                                   FROM states ORDER BY accessed LIMIT ?))
+                ORDER BY accessed LIMIT ?""", (_EVICT_BATCH, _EVICT_BATCH, _EVICT_BATCH)).fetchall()
+            if len(rows) == 0:
+                break
+            for kind, key, size in rows:
+                if self.size <= target:
+                    break
+                if kind == "object":
+                    self.db.execute("DELETE FROM objects WHERE object_id = ?", (key,))
+                    self.size -= size
+                else:
+                    self.__deleteState(key)
+        self.db.execute("COMMIT")
+
+    def __touched(self) -> None:
+        # caller holds self.lock
+        if len(self.touched_objects) + len(self.touched_states) >= _MAX_TOUCHED:
+            self.__flushTouched()
+
+    def __flushTouched(self) -> None:
+        # caller holds self.lock; writes the access times of cache hits in
+        # one transaction
+        if not self.touched_objects and not self.touched_states:
+            return
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.executemany("UPDATE objects SET accessed = ? WHERE object_id = ?",
+                            [(t, k) for k, t in self.touched_objects.items()])
+        self.db.executemany("UPDATE states SET accessed = ? WHERE key = ?",
+                            [(t, k) for k, t in self.touched_states.items()])
+        self.db.execute("COMMIT")
+        self.touched_objects.clear()
+        self.touched_states.clear()
+
+    def __totalSize(self) -> int:
+        row = self.db.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM objects) + (SELECT COALESCE(SUM(size), 0) FROM states)"
+        ).fetchone()
+        return row[0]
+
+
+def _state_key(object_id: str, version: str, path: str, recursive: bool) -> str:
+    return "\0".join((object_id, version, path, "r" if recursive else ""))
+
+
+# default number of entries in a MemoryCache
+DEFAULT_MEMORY_ENTRIES = 1024
+
+
+class MemoryCache:
+    """An in-process LRU cache with an optional ttl (seconds), used by Client
+    to memoize lookups. Concurrent calls for the same key share a single
+    in-flight call (see get_or_call). Without a ttl, entries never expire,
+    so Client only uses it for results that cannot change (e.g., the state
+    of an explicit version).
+    """
+    def __init__(self, maxsize: int = DEFAULT_MEMORY_ENTRIES, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.inflight: dict[Hashable, Future] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "shared": self.shared,
+                "entries": len(self.entries)}
+
+    def get_or_call(self, key: Hashable, fn: Callable[[], Any],
+                    valid: Optional[Callable[[Any], bool]] = None) -> Any:
+        """returns the cached value for key, or calls fn to get it. A cached
+        value is discarded if it has expired or if valid(value) is False. If
+        another thread is already calling fn for key, this call waits for
+        and shares its result (counted in shared). Exceptions are not
+        cached.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if time.monotonic() < expires and (valid is None or valid(value)):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            fut = self.inflight.get(key)
+            leader = fut is None
+            if leader:
+                self.misses += 1
+                fut = self.inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return fut.result()
+        try:
+            value = fn()
+        except BaseException as err:
+            with self.lock:
+                del self.inflight[key]
+            fut.set_exception(err)
+            raise
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+        with self.lock:
+            del self.inflight[key]
+            self.entries[key] = (expires, value)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        fut.set_result(value)
+        return value
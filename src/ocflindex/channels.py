@@ -0,0 +1,194 @@
+"""gRPC channel options and channel pools.
+"""
+import itertools
+import threading
+
+import grpc
+
+from grpc import aio
+from typing import Any, Optional, Sequence
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+
+# default size of the HTTP connection pool used for downloads
+DEFAULT_HTTP_POOL_SIZE = 32
+
+
+class ChannelOptions:
+    """Settings for the gRPC channels opened by a Client. Values left as
+    None use gRPC's defaults.
+
+    max_message_size limits the size of messages sent and received (gRPC's
+    default receive limit is 4 MiB, which large GetObjectState pages can
+    approach). keepalive_time and keepalive_timeout (seconds) send HTTP/2
+    pings on idle connections so that connections dropped by proxies are
+    detected before a call is made on them. compression (e.g.,
+    grpc.Compression.Gzip) is applied to requests and requested for
+    responses. window_size sets the initial HTTP/2 flow-control window;
+    bdp_probe turns gRPC's automatic window sizing on or off. options is a
+    list of additional (name, value) channel arguments.
+    """
+    def __init__(self, max_message_size: Optional[int] = None,
+                 keepalive_time: Optional[float] = None,
+                 keepalive_timeout: Optional[float] = None,
+                 keepalive_without_calls: bool = False,
+                 compression: Optional[grpc.Compression] = None,
+                 window_size: Optional[int] = None,
+                 bdp_probe: Optional[bool] = None,
+                 options: Sequence[tuple[str, Any]] = ()) -> None:
+        self.max_message_size = max_message_size
+        self.keepalive_time = keepalive_time
+        self.keepalive_timeout = keepalive_timeout
+        self.keepalive_without_calls = keepalive_without_calls
+        self.compression = compression
+        self.window_size = window_size
+        self.bdp_probe = bdp_probe
+        self.options = list(options)
+
+    def channel_args(self) -> list[tuple[str, Any]]:
+        args: list[tuple[str, Any]] = []
+        if self.max_message_size is not None:
+            args.append(("grpc.max_send_message_length", self.max_message_size))
+            args.append(("grpc.max_receive_message_length", self.max_message_size))
+        if self.keepalive_time is not None:
+            args.append(("grpc.keepalive_time_ms", int(self.keepalive_time * 1000)))
+            args.append(("grpc.keepalive_permit_without_calls", int(self.keepalive_without_calls)))
+            if self.keepalive_without_calls:
+                # allow pings on connections with no active calls
+                args.append(("grpc.http2.max_pings_without_data", 0))
+        if self.keepalive_timeout is not None:
+            args.append(("grpc.keepalive_timeout_ms", int(self.keepalive_timeout * 1000)))
+        if self.window_size is not None:
+            args.append(("grpc.http2.lookahead_bytes", self.window_size))
+        if self.bdp_probe is not None:
+            args.append(("grpc.http2.bdp_probe", int(self.bdp_probe)))
+        args.extend(self.options)
+        return args
+
+
+def open_channel(url: str, client_key: Optional[str] = None, client_cert: Optional[str] = None,
+                 options: Optional[ChannelOptions] = None, own_connection: bool = False,
+                 asyncio: bool = False, interceptors: Optional[Sequence[Any]] = None) -> tuple[str, Any]:
+    """opens a channel to the ocfl-index server at url, returning the
+    server address and the channel. If own_connection is True, the channel
+    does not share its connection with other channels to the same address
+    (gRPC shares them by default). With asyncio=True, the channel is a
+    grpc.aio channel with the given interceptors.
+    """
+    options = options or ChannelOptions()
+    args = options.channel_args()
+    if own_connection:
+        args.append(("grpc.use_local_subchannel_pool", 1))
+    kwargs: dict[str, Any] = {"options": args, "compression": options.compression}
+    if asyncio:
+        kwargs["interceptors"] = interceptors
+    module: Any = aio if asyncio else grpc
+    if url.startswith("https://"):
+        if client_cert is not None and client_key is not None:
+            cert = open(client_cert, "rb").read()
+            key = open(client_key, "rb").read()
+            credentials = grpc.ssl_channel_credentials(private_key=key, certificate_chain=cert)
+        else:
+            credentials = grpc.ssl_channel_credentials()
+        srv_addr = url.removeprefix("https://")
+        channel = module.secure_channel(srv_addr, credentials=credentials, **kwargs)
+    elif url.startswith("http://"):
+        srv_addr = url.removeprefix("http://")
+        channel = module.insecure_channel(srv_addr, **kwargs)
+    else:
+        raise Exception("client url should begin with 'http://' or 'https://'")
+    return srv_addr, channel
+
+
+class ChannelPool:
+    """A fixed set of channels, each with its own connection, and a stub
+    for each. stub() returns the next stub in turn (selection=ROUND_ROBIN)
+    or the stub whose channel has the fewest calls in progress
+    (LEAST_LOADED). interceptors are applied to every channel.
+    """
+    def __init__(self, channels: Sequence[grpc.Channel], stub_class: Any,
+                 selection: str = ROUND_ROBIN,
+                 interceptors: Sequence[Any] = ()) -> None:
+        if selection not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError(f"unknown channel selection: {selection!r}")
+        if len(channels) == 0:
+            raise ValueError("ChannelPool requires at least one channel")
+        self.channels = list(channels)
+        self.selection = selection
+        self.lock = threading.Lock()
+        self.load = [0] * len(self.channels)
+        self.stubs = []
+        for i, channel in enumerate(self.channels):
+            chain = list(interceptors)
+            if selection == LEAST_LOADED:
+                chain.insert(0, _LoadCounter(self, i))
+            if chain:
+                channel = grpc.intercept_channel(channel, *chain)
+            self.stubs.append(stub_class(channel))
+        self.next = itertools.cycle(range(len(self.stubs)))
+
+    def stub(self) -> Any:
+        if len(self.stubs) == 1:
+            return self.stubs[0]
+        if self.selection == ROUND_ROBIN:
+            with self.lock:
+                return self.stubs[next(self.next)]
+        with self.lock:
+            # ties go to the next channel in turn, so idle channels are all used
+            start = next(self.next)
+            n = len(self.stubs)
+            best = min(range(start, start + n), key=lambda i: self.load[i % n])
+        return self.stubs[best % n]
+
+    def close(self) -> None:
+        for channel in self.channels:
+            channel.close()
+
+    def _started(self, i: int) -> None:
+        with self.lock:
+            self.load[i] += 1
+
+    def _finished(self, i: int) -> None:
+        with self.lock:
+            self.load[i] -= 1
+
+
+class PooledStub:
+    """Stands in for a service stub, making each call on a stub chosen by
+    the pool: pool.stub().GetObject(req) is written stub.GetObject(req).
+    """
+    def __init__(self, pool: ChannelPool) -> None:
+        self.pool = pool
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool.stub(), name)
+
+
+class _LoadCounter(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    # counts the calls in progress on one channel of a pool
+    def __init__(self, pool: ChannelPool, index: int) -> None:
+        self.pool = pool
+        self.index = index
+
+    def __track(self, call: Any) -> Any:
+        call.add_done_callback(lambda _: self.pool._finished(self.index))
+        return call
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        self.pool._started(self.index)
+        try:
+            call = continuation(client_call_details, request)
+        except BaseException:
+            self.pool._finished(self.index)
+            raise
+        return self.__track(call)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        self.pool._started(self.index)
+        try:
+            call = continuation(client_call_details, request)
+        except BaseException:
+            self.pool._finished(self.index)
+            raise
+        return self.__track(call)
@@ -0,0 +1,241 @@
+"""The ocflindex command.
+
+    ocflindex [--url URL] status
+    ocflindex [--url URL] list [--prefix P] [--format ndjson|csv] [-o FILE]
+    ocflindex [--url URL] state OBJECT_ID [--version V] [--path P] [--format ndjson|csv] [-o FILE]
+    ocflindex [--url URL] download [DIGEST ...] [--from FILE] [--dest DIR] [--jobs N]
+    ocflindex [--url URL] export OBJECT_ID DEST [--version V] [--jobs N]
+
+The server url may also be given with the OCFL_INDEX_URL environment
+variable. With several urls (--url repeated, or comma-separated in
+OCFL_INDEX_URL), reads are spread over the replicas. Listings are written
+one page at a time, so memory use does not grow with the size of the
+listing. Downloads and exports skip files that are already complete and
+resume partial ones, so an interrupted command can be re-run. A summary
+with throughput is printed to stderr when a command finishes (unless
+--quiet is given).
+"""
+import argparse
+import os
+import sys
+import time
+
+import grpc
+
+from ocflindex import bulk, columnar
+from ocflindex.client import Client
+from ocflindex.download import file_digest
+from typing import Iterator, Optional, TextIO
+
+_WRITERS = {"ndjson": columnar.write_ndjson, "csv": columnar.write_csv}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    urls = args.url or [u for u in os.environ.get("OCFL_INDEX_URL", "").split(",") if u]
+    if not urls:
+        print("ocflindex: a server url is required (--url or OCFL_INDEX_URL)", file=sys.stderr)
+        return 2
+    client = Client(urls, client_key=args.key, client_cert=args.cert, channels=args.channels)
+    if args.download_url:
+        client.download_base_url = args.download_url
+    start = time.perf_counter()
+    try:
+        with client:
+            return args.run(client, args, start)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # the reader went away (e.g., piped to head)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except Exception as err:
+        message = _error_message(err)
+        if message is None:
+            raise
+        print(f"ocflindex: {message}", file=sys.stderr)
+        return 1
+
+
+def _error_message(err: Exception) -> Optional[str]:
+    # "<code>: <details>" for errors from the server, or None
+    if isinstance(err, grpc.RpcError):
+        return f"{err.code().name}: {err.details()}"
+    # requests is only imported once there is a download, so an HTTPError
+    # can only have been raised if it is loaded
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(err, requests.HTTPError):
+        if err.response is None:
+            return str(err)
+        return f"{err.response.status_code}: {err.response.reason} ({err.response.url})"
+    return None
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="ocflindex", description="Query an ocfl-index server.")
+    parser.add_argument("--url", action="append",
+                        help="server url, repeated for replicas (default: $OCFL_INDEX_URL, comma-separated)")
+    parser.add_argument("--download-url", help="base url for downloads, if different from --url")
+    parser.add_argument("--cert", help="client certificate file")
+    parser.add_argument("--key", help="client key file")
+    parser.add_argument("--channels", type=int, default=1, help="number of gRPC connections")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't print a summary")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("status", help="print the server's status as JSON")
+    cmd.set_defaults(run=_status)
+
+    cmd = commands.add_parser("list", help="list objects")
+    cmd.add_argument("--prefix", default="", help="only list ids starting with prefix")
+    _output_args(cmd)
+    cmd.set_defaults(run=_list)
+
+    cmd = commands.add_parser("state", help="list the files in an object version")
+    cmd.add_argument("object_id")
+    cmd.add_argument("--version", default="", help="version (default: head)")
+    cmd.add_argument("--path", default=".", help="directory in the version state")
+    cmd.add_argument("--no-recursive", dest="recursive", action="store_false",
+                     help="only list the immediate children of path")
+    _output_args(cmd)
+    cmd.set_defaults(run=_state)
+
+    cmd = commands.add_parser("download", help="download content by digest")
+    cmd.add_argument("digests", nargs="*", metavar="DIGEST")
+    cmd.add_argument("--from", dest="digest_file", metavar="FILE",
+                     help="read digests from FILE, one per line ('-' for stdin)")
+    cmd.add_argument("--dest", default=".", help="directory for downloaded files (default: .)")
+    cmd.add_argument("--algorithm", default="sha512", help="digest algorithm (default: sha512)")
+    _transfer_args(cmd)
+    cmd.set_defaults(run=_download)
+
+    cmd = commands.add_parser("export", help="download the files in an object version")
+    cmd.add_argument("object_id")
+    cmd.add_argument("dest")
+    cmd.add_argument("--version", default="", help="version (default: head)")
+    cmd.add_argument("--no-link", dest="link", action="store_false",
+                     help="copy files with the same content instead of hard linking them")
+    _transfer_args(cmd)
+    cmd.set_defaults(run=_export)
+    return parser
+
+
+def _output_args(cmd: argparse.ArgumentParser) -> None:
+    cmd.add_argument("--format", choices=sorted(_WRITERS), default="ndjson")
+    cmd.add_argument("-o", "--output", help="output file (default: stdout)")
+    cmd.add_argument("--prefetch", type=int, default=1, help="pages fetched ahead (default: 1)")
+
+
+def _transfer_args(cmd: argparse.ArgumentParser) -> None:
+    cmd.add_argument("-j", "--jobs", type=int, default=bulk.DEFAULT_CONCURRENCY,
+                     help=f"concurrent downloads (default: {bulk.DEFAULT_CONCURRENCY})")
+    cmd.add_argument("--parts", type=int, default=1,
+                     help="concurrent range requests per file (default: 1)")
+
+
+def _status(client: Client, args, start: float) -> int:
+    from google.protobuf import json_format
+    from ocfl.v1 import index_pb2 as pb2
+    resp = client.api.GetStatus(pb2.GetStatusRequest())
+    print(json_format.MessageToJson(resp, preserving_proto_field_name=True,
+                                    including_default_value_fields=True))
+    return 0
+
+
+def _list(client: Client, args, start: float) -> int:
+    batches = client.list_objects_batches(prefix=args.prefix, prefetch=args.prefetch)
+    rows = _write(batches, args)
+    _summary(args, start, f"listed {rows:,} objects", items=rows)
+    return 0
+
+
+def _state(client: Client, args, start: float) -> int:
+    batches = client.iter_object_state_batches(args.object_id, path=args.path, version=args.version,
+                                               recursive=args.recursive, prefetch=args.prefetch)
+    rows = _write(batches, args)
+    _summary(args, start, f"listed {rows:,} entries", items=rows)
+    return 0
+
+
+def _write(batches, args) -> int:
+    write = _WRITERS[args.format]
+    if args.output is None:
+        return write(batches, sys.stdout)
+    tmp = args.output + ".part"
+    try:
+        rows = write(batches, tmp)
+        os.replace(tmp, args.output)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return rows
+
+
+def _download(client: Client, args, start: float) -> int:
+    os.makedirs(args.dest, exist_ok=True)
+    digests = _digests(args)
+    downloaded = skipped = failed = nbytes = 0
+
+    def fetch(digest: str) -> int:
+        dest = os.path.join(args.dest, digest)
+        if os.path.isfile(dest) and file_digest(dest, args.algorithm) == digest.lower():
+            return -1
+        return client.download(digest, dest, digest_algorithm=args.algorithm, parts=args.parts)
+
+    for digest, size, err in bulk.fan_out(fetch, digests, args.jobs, ordered=False):
+        if err is not None:
+            if not isinstance(err, Exception):
+                raise err
+            failed += 1
+            print(f"ocflindex: {digest}: {err}", file=sys.stderr)
+        elif size < 0:
+            skipped += 1
+        else:
+            downloaded += 1
+            nbytes += size
+    _summary(args, start, f"downloaded {downloaded:,} files, {skipped:,} already present, {failed:,} failed",
+             nbytes=nbytes)
+    return 1 if failed else 0
+
+
+def _digests(args) -> Iterator[str]:
+    yield from args.digests
+    if args.digest_file is None:
+        return
+    f: TextIO = sys.stdin if args.digest_file == "-" else open(args.digest_file)
+    with f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def _export(client: Client, args, start: float) -> int:
+    result = client.export_version(args.object_id, args.version, args.dest, jobs=args.jobs,
+                                   parts=args.parts, link=args.link)
+    for digest, err in result.errors.items():
+        print(f"ocflindex: {digest}: {err}", file=sys.stderr)
+    _summary(args, start,
+             f"exported {result.files:,} files: {result.downloaded:,} downloaded, {result.linked:,} linked, "
+             f"{result.skipped:,} already present, {len(result.errors):,} failed",
+             nbytes=result.bytes_downloaded)
+    return 1 if result.errors else 0
+
+
+def _summary(args, start: float, message: str, items: int = 0, nbytes: int = 0) -> None:
+    if args.quiet:
+        return
+    elapsed = time.perf_counter() - start
+    rate = ""
+    if items:
+        rate = f" ({items / elapsed:,.0f}/s)"
+    elif nbytes:
+        rate = f", {nbytes / (1 << 20):,.1f} MiB ({nbytes / (1 << 20) / elapsed:,.1f} MiB/s)"
+    print(f"{message}{rate} in {elapsed:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
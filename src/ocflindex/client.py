@@ -0,0 +1,681 @@
+"""The synchronous ocfl-index client. Results are converted to pydantic
+models (see models) only when they are first needed, and the HTTP session
+used for downloads is created on first use, so that a client used for a
+few raw queries doesn't load either.
+"""
+from __future__ import annotations
+
+import os
+import grpc
+import threading
+import time
+
+from ocfl.v1 import index_pb2 as pb2
+from ocfl.v1 import index_pb2_grpc as api
+from ocflindex import bulk, columnar, paging
+from ocflindex.download import download_url, stream_url, DEFAULT_PARTS, DEFAULT_PART_SIZE
+from ocflindex.export import export_version, ExportResult
+from ocflindex.diff import FileChange, diff_versions
+from ocflindex.columnar import ColumnBatch
+from ocflindex.bulk import ObjectResult, ReindexResult, DEFAULT_CONCURRENCY, DEFAULT_REINDEX_BATCH, DEFAULT_REINDEX_CONCURRENCY
+from ocflindex.builders import Builders, RAW, projection, timed, pydantic_builders
+from ocflindex.retry import RetryPolicy, DEFAULT_RETRY
+from ocflindex.metrics import Recorder, MetricsInterceptor
+from ocflindex.channels import ChannelOptions, ChannelPool, PooledStub, open_channel, ROUND_ROBIN, DEFAULT_HTTP_POOL_SIZE
+from ocflindex.replicas import HedgePolicy, Replica, ReplicaSet, ReplicaStub, DEFAULT_HEALTH_INTERVAL
+from ocflindex.paging import ObjectStatePager, DEFAULT_STATE_PAGE_SIZE, MAX_STATE_PAGE_SIZE
+from ocflindex.sync import Change, SnapshotEntry, SnapshotWriter, diff_snapshots, read_snapshot
+from ocflindex.shards import list_adaptive, list_sharded, IncompleteListing
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional, Iterable, Iterator, Sequence, Union
+
+if TYPE_CHECKING:
+    import requests
+    from ocflindex.blobs import BlobCache
+    from ocflindex.cache import MetadataCache, MemoryCache
+    from ocflindex.models import Status, Object, ObjectState, ObjectStateChild, ObjectListItem
+
+
+class ObjectListIterator:
+    """Iterates over ListObjects results. Pages are not requested until the
+    first call to __next__. If prefetch is greater than 0, up to that many
+    pages are fetched in the background while the current page is consumed.
+    Items are built with models.object_list_item.
+    """
+    def __init__(self, api, page_size=1000, prefix="", prefetch=0, models: Optional[Builders] = None):
+        self.api = api
+        self.models = models if models is not None else pydantic_builders(True)
+        self.next_page_token = ""
+        self.page_size=page_size
+        self.prefix=prefix
+        self.prefetch=prefetch
+        self.offset=0
+        self.objects=[]
+        self.pages=None
+
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        while self.offset >= len(self.objects):
+            if self.pages is None:
+                pages = paging.list_pages(self.api, self.prefix, self.page_size, self.next_page_token)
+                self.pages = paging.prefetch(pages, self.prefetch)
+            try:
+                resp = next(self.pages, None)
+            except BaseException:
+                # the failed page generator can't be resumed; the next call
+                # starts a new one from the last page received.
+                if isinstance(self.pages, paging.Prefetcher):
+                    self.pages.close()
+                self.pages = None
+                raise
+            if resp is None:
+                raise StopIteration
+            self.offset = 0
+            self.objects = resp.objects
+            self.next_page_token = resp.next_page_token
+        item = self.objects[self.offset]
+        self.offset += 1
+        return self.models.object_list_item(item)
+
+class Client:
+    """Client for an ocfl-index server. If validate is False, results are
+    built from the server's responses without pydantic validation (see
+    models.FAST), which is considerably faster for large listings.
+
+    Most query methods also take raw=True, which returns the protobuf
+    messages from the server without conversion, and listing methods take
+    fields, a list of message field names to return as tuples (e.g.,
+    ("object_id", "head")).
+
+    If cache is given, GetObject and GetObjectState responses are stored in
+    and served from it (see cache.MetadataCache). If memo is given,
+    get_status, get_object and get_object_state results are memoized in
+    process (see cache.MemoryCache) and concurrent calls with the same
+    arguments share one RPC. Results that can change (the status, an
+    object without a head to check, and the head version's state) are only
+    memoized if memo has a ttl. Memoized responses are shared: results
+    returned with raw=True should not be modified. If blobs is given,
+    content_stream and download serve content from it and add downloaded
+    content to it (see blobs.BlobCache).
+
+    retry sets the deadlines and retries for RPCs and downloads (see
+    retry.RetryPolicy). By default, each RPC has a 60 second deadline and
+    calls that fail with UNAVAILABLE, DEADLINE_EXCEEDED or ABORTED are tried
+    up to 5 times; pass retry=None to disable both.
+
+    channel_options configures the gRPC channels (see
+    channels.ChannelOptions). By default, all RPCs share one channel and one
+    HTTP/2 connection. With channels greater than 1, the client opens that
+    many channels, each with its own connection, and spreads calls over
+    them in turn (selection=ROUND_ROBIN) or by fewest calls in progress
+    (LEAST_LOADED). Downloads use a pool of up to http_pool_size
+    connections, which should be at least the number of threads
+    downloading at once.
+
+    If metrics is given, RPC latencies, listing page sizes, downloads,
+    model conversion times and cache counters are reported to it (see
+    metrics.Stats and metrics.PrometheusRecorder).
+
+    url may also be a list of urls of replicas of one index. Reads are then
+    routed to the fastest healthy replica, and slow reads are hedged to a
+    second replica if hedge is given (see replicas.ReplicaSet and
+    replicas.HedgePolicy). Replicas are health-checked every
+    health_interval seconds. Downloads use the first url.
+    """
+    def __init__(self, url: Union[str, Sequence[str]],
+                 client_key: Optional[str] = None,
+                 client_cert: Optional[str] = None,
+                 validate: bool = True,
+                 cache: Optional[MetadataCache] = None,
+                 memo: Optional[MemoryCache] = None,
+                 blobs: Optional[BlobCache] = None,
+                 retry: Optional[RetryPolicy] = DEFAULT_RETRY,
+                 channels: int = 1,
+                 selection: str = ROUND_ROBIN,
+                 channel_options: Optional[ChannelOptions] = None,
+                 http_pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+                 metrics: Optional[Recorder] = None,
+                 hedge: Optional[HedgePolicy] = None,
+                 health_interval: Optional[float] = DEFAULT_HEALTH_INTERVAL) -> None:
+        urls = [url] if isinstance(url, str) else list(url)
+        if not urls:
+            raise ValueError("Client requires at least one url")
+        self.download_base_url = urls[0]
+        self.validate = validate
+        self.__models: Optional[Builders] = None
+        self.cache = cache
+        self.memo = memo
+        self.blobs = blobs
+        self.retry = retry
+        self.metrics = metrics
+        if metrics is not None:
+            for name, c in (("memo", memo), ("metadata", cache), ("blobs", blobs)):
+                if c is not None:
+                    metrics.watch_cache(name, c)
+        interceptors: list = []
+        if retry is not None and len(urls) == 1:
+            # with replicas, the ReplicaSet retries, so that a failed
+            # attempt can be retried on another replica
+            interceptors.append(retry.interceptor())
+        if metrics is not None:
+            # inside the retry interceptor, so each attempt is measured
+            interceptors.append(MetricsInterceptor(metrics))
+        pools = []
+        for u in urls:
+            channel_list = []
+            for _ in range(max(1, channels)):
+                srv_addr, channel = open_channel(u, client_key, client_cert, channel_options,
+                                                 own_connection=channels > 1)
+                channel_list.append(channel)
+            pools.append(ChannelPool(channel_list, api.IndexServiceStub, selection, interceptors))
+            if len(pools) == 1:
+                self.srv_addr = srv_addr
+        self.pool = pools[0]
+        self.channel = self.pool.channels[0]
+        self.replicas: Optional[ReplicaSet] = None
+        if len(pools) > 1:
+            self.replicas = ReplicaSet([Replica(u, p) for u, p in zip(urls, pools)], retry, hedge,
+                                       health_interval)
+            self.api = ReplicaStub(self.replicas)
+        elif len(self.pool.channels) > 1:
+            self.api = PooledStub(self.pool)
+        else:
+            self.api = self.pool.stub()
+        self.client_key = client_key
+        self.client_cert = client_cert
+        self.http_pool_size = http_pool_size
+        self.__session: Optional[requests.Session] = None
+        self.__sessionLock = threading.Lock()
+
+    @property
+    def models(self) -> Builders:
+        """the functions used to build results (models.VALIDATED or
+        models.FAST)
+        """
+        if self.__models is None:
+            models = pydantic_builders(self.validate)
+            if self.metrics is not None:
+                models = timed(models, self.metrics.conversion)
+            self.__models = models
+        return self.__models
+
+    @property
+    def session(self) -> requests.Session:
+        """the requests.Session used for downloads"""
+        with self.__sessionLock:
+            if self.__session is None:
+                import requests
+                import requests.adapters
+                session = requests.Session()
+                session.cert = (self.client_cert, self.client_key)
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.http_pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self.__session = session
+            return self.__session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.replicas is not None:
+            self.replicas.close()
+        else:
+            self.pool.close()
+        if self.__session is not None:
+            self.__session.close()
+
+    def get_status(self) -> Status:
+        if self.__memoizes(changing=True):
+            resp = self.memo.get_or_call(("status",), lambda: self.api.GetStatus(pb2.GetStatusRequest()))
+        else:
+            resp = self.api.GetStatus(pb2.GetStatusRequest())
+        return self.models.status(resp)
+
+    def index_all(self) -> None:
+        """starts a scan of the storage root on the server that indexes every
+        object (and removes objects that no longer exist). It returns once the
+        scan has started; use follow_logs to watch its progress.
+        """
+        self.api.IndexAll(pb2.IndexAllRequest())
+
+    def index_ids(self, object_ids: Iterable[str]) -> None:
+        """indexes the objects in one IndexIDs call, returning after they have
+        been indexed. See reindex for large numbers of ids.
+        """
+        self.api.IndexIDs(pb2.IndexIDsRequest(object_ids=object_ids))
+
+    def reindex(self, object_ids: Iterable[str], batch_size: int = DEFAULT_REINDEX_BATCH,
+                concurrency: int = DEFAULT_REINDEX_CONCURRENCY) -> Iterator[ReindexResult]:
+        """indexes many objects, yielding a ReindexResult as each IndexIDs call
+        completes. object_ids is read lazily and split into batches of up to
+        batch_size ids, and at most concurrency calls run at once. No more than
+        2 * concurrency batches are read ahead, so a generator of ids is never
+        materialized in full. Failed batches are reported on their result; the
+        remaining batches are still sent.
+        """
+        batches = bulk.batched(object_ids, batch_size)
+        for ids, _, err in bulk.fan_out(self.index_ids, batches, concurrency, ordered=False):
+            if err is not None and not isinstance(err, Exception):
+                raise err
+            yield ReindexResult(ids, err)
+
+    def follow_logs(self, reconnect: bool = True) -> Iterator[str]:
+        """yields log messages from the server's indexing tasks as they arrive.
+        If reconnect is True and the stream fails with UNAVAILABLE (for
+        instance, the connection dropped or the server restarted), a new
+        stream is opened after the client's retry policy backoff; the backoff
+        is reset once a message is received. The generator ends when the
+        server closes the stream.
+        """
+        policy = self.retry or DEFAULT_RETRY
+        retries = 0
+        while True:
+            stream = self.api.FollowLogs(pb2.FollowLogsRequest())
+            try:
+                for resp in stream:
+                    retries = 0
+                    yield resp.message
+                return
+            except grpc.RpcError as err:
+                if not reconnect or err.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise
+            finally:
+                stream.cancel()
+            time.sleep(policy.backoff(retries))
+            retries = min(retries + 1, 32)
+
+    def get_object(self, object_id: str, raw: bool = False, head: Optional[str] = None) -> Object:
+        """returns details for the object. With a cache, head (e.g., from
+        list_objects) is used to revalidate a cached response; otherwise the
+        cache's ttl applies.
+        """
+        obj = self.__getObject(object_id, head)
+        return self.__builders(raw).object(obj)
+
+    def __getObject(self, object_id: str, head: Optional[str] = None) -> pb2.GetObjectResponse:
+        if self.__memoizes(changing=head is None):
+            def valid(obj: pb2.GetObjectResponse) -> bool:
+                return head is None or (len(obj.versions) > 0 and obj.versions[-1].num == head)
+            return self.memo.get_or_call(("object", object_id),
+                                         lambda: self.__fetchObject(object_id, head), valid)
+        return self.__fetchObject(object_id, head)
+
+    def __fetchObject(self, object_id: str, head: Optional[str] = None) -> pb2.GetObjectResponse:
+        if self.cache is not None:
+            obj = self.cache.get_object(object_id, head)
+            if obj is not None:
+                return obj
+        obj =  self.api.GetObject(pb2.GetObjectRequest(object_id=object_id))
+        if self.cache is not None:
+            self.cache.put_object(obj)
+        return obj
+
+    def get_objects(self, object_ids: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                    ordered: bool = True, state: bool = False,
+                    recursive: bool = False) -> Iterator[ObjectResult]:
+        """looks up many objects concurrently, yielding an ObjectResult for each
+        id in object_ids. Results are yielded in input order or, if ordered is
+        False, as lookups complete. If state is True, the head version state
+        (see get_object_state) is also fetched for each object. Errors are
+        reported on the result for the failing id.
+        """
+        def lookup(object_id: str) -> ObjectResult:
+            obj = self.get_object(object_id)
+            obj_state = None
+            if state:
+                obj_state = self.get_object_state(object_id, recursive=recursive)
+            return ObjectResult(object_id, obj, obj_state)
+
+        for object_id, result, err in bulk.fan_out(lookup, object_ids, concurrency, ordered):
+            if err is not None:
+                if not isinstance(err, Exception):
+                    raise err
+                result = ObjectResult(object_id, error=err)
+            yield result
+   
+    def get_object_state(self, object_id: str, path: str = ".", version: str = "", recursive: bool = False,
+                         page_size: int = DEFAULT_STATE_PAGE_SIZE,
+                         max_page_size: int = MAX_STATE_PAGE_SIZE,
+                         prefetch: int = 0, raw: bool = False) -> ObjectState:
+        """returns the logical state of path in the object version. Children
+        are requested in pages that start at page_size and grow up to
+        max_page_size (or the server's limit). If prefetch is greater than 0,
+        up to that many pages are fetched in the background while the current
+        page is converted. With raw=True, the result is a single
+        GetObjectStateResponse holding the children from every page.
+        """
+        if self.__memoizes(changing=version == ""):
+            key = ("state", object_id, path, version, recursive)
+            resp = self.memo.get_or_call(key, lambda: self.__stateResponse(
+                object_id, path, version, recursive, page_size, max_page_size, prefetch))
+            return resp if raw else self.models.object_state(resp)
+        if raw:
+            return self.__stateResponse(object_id, path, version, recursive, page_size, max_page_size, prefetch)
+        pages = self.__statePages(object_id, path, version, recursive, page_size, max_page_size, prefetch)
+        state = self.models.object_state(next(pages))
+        for resp in pages:
+            for ch in resp.children:
+                state.children.append(self.models.object_state_child(ch))
+        return state
+
+    def iter_object_state(self, object_id: str, path: str = ".", version: str = "", recursive: bool = False,
+                          page_size: int = DEFAULT_STATE_PAGE_SIZE,
+                          max_page_size: int = MAX_STATE_PAGE_SIZE,
+                          prefetch: int = 0, raw: bool = False,
+                          fields: Optional[Sequence[str]] = None) -> Iterator[ObjectStateChild]:
+        """like get_object_state, but yields the children of path as each page
+        arrives instead of collecting them in an ObjectState. Only the current
+        page (plus any prefetched pages) is held in memory. Children are
+        GetObjectStateResponse.Item messages if raw is True, or tuples of the
+        named Item fields if fields is given.
+        """
+        build = self.__builders(raw, fields).object_state_child
+        pages = self.__statePages(object_id, path, version, recursive, page_size, max_page_size, prefetch)
+        for resp in pages:
+            for ch in resp.children:
+                yield build(ch)
+
+    def iter_object_state_batches(self, object_id: str, path: str = ".", version: str = "",
+                                  recursive: bool = False,
+                                  page_size: int = DEFAULT_STATE_PAGE_SIZE,
+                                  max_page_size: int = MAX_STATE_PAGE_SIZE,
+                                  prefetch: int = 0) -> Iterator[ColumnBatch]:
+        """like iter_object_state, but yields each page as a ColumnBatch with
+        name, digest, isdir and size columns.
+        """
+        pages = self.__statePages(object_id, path, version, recursive, page_size, max_page_size, prefetch)
+        for resp in pages:
+            yield columnar.object_state_batch(resp)
+
+    def walk_object_state(self, object_id: str, path: str = ".", version: str = "",
+                          **kwargs) -> Iterator[tuple[str, list[ObjectStateChild], list[ObjectStateChild]]]:
+        """walks the directory tree of the object version top-down, starting at
+        path. Like os.walk, it yields (dirpath, dirs, files) for each directory
+        and the caller may remove entries from dirs to skip them. Each
+        directory is listed with iter_object_state, which receives kwargs.
+        """
+        dirs: list[ObjectStateChild] = []
+        files: list[ObjectStateChild] = []
+        for ch in self.iter_object_state(object_id, path=path, version=version, **kwargs):
+            (dirs if ch.isdir else files).append(ch)
+        yield path, dirs, files
+        for d in dirs:
+            subpath = d.name if path in (".", "") else f"{path}/{d.name}"
+            yield from self.walk_object_state(object_id, path=subpath, version=version, **kwargs)
+
+    def diff_versions(self, object_id: str, v_a: str, v_b: str, path: str = ".") -> Iterator[FileChange]:
+        """yields a FileChange for each file under path that was added,
+        removed or modified between versions v_a and v_b, in path order.
+        Directories are listed one level at a time and only descended into
+        if their digests differ, so unchanged subtrees are never listed.
+        Directories that exist in only one version are listed recursively.
+        """
+        return diff_versions(self, object_id, v_a, v_b, path)
+
+    def __stateResponse(self, object_id: str, path: str, version: str, recursive: bool,
+                        page_size: int, max_page_size: int, prefetch: int) -> pb2.GetObjectStateResponse:
+        # all pages of the state query, combined in one response
+        pages = self.__statePages(object_id, path, version, recursive, page_size, max_page_size, prefetch)
+        state = next(pages)
+        for resp in pages:
+            state.children.extend(resp.children)
+        state.next_page_token = ""
+        return state
+
+    def __statePages(self, object_id: str, path: str, version: str, recursive: bool,
+                     page_size: int, max_page_size: int, prefetch: int) -> Iterator[pb2.GetObjectStateResponse]:
+        req = pb2.GetObjectStateRequest(
+            object_id=object_id,
+            base_path = path,
+            version = version,
+            recursive = recursive)
+        pager = ObjectStatePager(self.api, req, page_size=page_size, max_page_size=max_page_size)
+        pages: Iterator[pb2.GetObjectStateResponse] = iter(pager)
+        if self.cache is not None:
+            # state is only cached for an explicit version, so resolve the
+            # head version (from the cached object, if possible).
+            if version == "":
+                versions = self.__getObject(object_id).versions
+                if len(versions) > 0:
+                    version = req.version = versions[-1].num
+            if version != "":
+                cached = self.cache.state_pages(object_id, version, path, recursive)
+                if cached is not None:
+                    pages = self.__cachedStatePages(cached, pager)
+                else:
+                    pages = self.cache.cache_state_pages(object_id, version, path, recursive, pages)
+        return paging.prefetch(pages, prefetch)
+
+    def __cachedStatePages(self, cached: Iterator[pb2.GetObjectStateResponse],
+                           pager: ObjectStatePager) -> Iterator[pb2.GetObjectStateResponse]:
+        skip = 0
+        try:
+            for resp in cached:
+                skip += len(resp.children)
+                yield resp
+            return
+        except KeyError:
+            pass
+        # the entry was evicted while it was read: continue from the server,
+        # skipping children that have been returned.
+        for resp in pager:
+            if skip >= len(resp.children):
+                skip -= len(resp.children)
+                continue
+            del resp.children[:skip]
+            skip = 0
+            yield resp
+       
+    def list_objects(self, prefix: str ="", page_size: int = 1000, prefetch: int = 0,
+                     raw: bool = False, fields: Optional[Sequence[str]] = None) -> ObjectListIterator:
+        """lists objects with ids beginning with prefix. Items are
+        ListObjectsResponse.Object messages if raw is True, or tuples of the
+        named Object fields if fields is given.
+        """
+        models = self.__builders(raw, fields)
+        return ObjectListIterator(self.api, page_size=page_size, prefix=prefix, prefetch=prefetch, models=models)
+
+    def list_objects_batches(self, prefix: str = "", page_size: int = 1000,
+                             prefetch: int = 0) -> Iterator[ColumnBatch]:
+        """like list_objects, but yields each page as a ColumnBatch with
+        object_id, head, v1_created and head_created columns. See
+        ocflindex.columnar for writing batches to CSV, Parquet or Arrow IPC.
+        """
+        pages = paging.prefetch(paging.list_pages(self.api, prefix, page_size), prefetch)
+        for resp in pages:
+            yield columnar.object_list_batch(resp)
+
+    def list_objects_parallel(self, prefix: str = "", shards: Optional[Iterable[str]] = None,
+                              alphabet: Optional[str] = None,
+                              concurrency: int = 8, ordered: bool = True,
+                              page_size: int = 1000, prefetch: int = 1, raw: bool = False,
+                              fields: Optional[Sequence[str]] = None) -> Iterator[ObjectListItem]:
+        """lists objects with ids beginning with prefix by splitting the id
+        space into prefix shards that are listed concurrently. Either shards
+        (id prefixes, see shards.prefix_shards) or alphabet must be given.
+        With alphabet, the shards are found by probing the server (see
+        shards.split_shards) while the first pages are listed sequentially,
+        and the rest of the listing is read from the shards once they are
+        found (see shards.list_adaptive). Probing costs a ListObjects call
+        per character in alphabet for each split, so it only pays off with
+        a narrow alphabet, such as "0123456789" for numeric ids after
+        prefix. Ids that continue with a character outside of the shards or
+        alphabet (and not seen while probing) are not listed.
+
+        When listing the whole index (prefix is ""), the number of objects
+        listed is checked against the server's status once the listing
+        ends, and shards.IncompleteListing is raised if any were missed
+        (or if objects were removed during the listing).
+
+        If ordered is True, results are merged into the same lexicographic
+        order as list_objects, otherwise they are yielded as pages arrive.
+        At most concurrency ListObjects calls are made at once while
+        listing shards. raw and fields are as for list_objects.
+        """
+        if shards is None and alphabet is None:
+            raise ValueError("list_objects_parallel requires shards or alphabet")
+        build = self.__builders(raw, fields).object_list_item
+        expected = None
+        if prefix == "":
+            status = self.api.GetStatus(pb2.GetStatusRequest())
+            # objects that failed to index are counted in paths but not
+            # listed
+            expected = min(status.num_object_paths, status.num_inventories)
+        if shards is None:
+            objects = list_adaptive(self.api, prefix, concurrency=concurrency, ordered=ordered,
+                                    page_size=page_size, prefetch=prefetch, alphabet=alphabet)
+        else:
+            objects = list_sharded(self.api, shards, prefix=prefix, concurrency=concurrency,
+                                   ordered=ordered, page_size=page_size, prefetch=prefetch)
+        listed = 0
+        for obj in objects:
+            listed += 1
+            yield build(obj)
+        if expected is not None and listed < expected:
+            raise IncompleteListing(f"listed {listed:,} of {expected:,} objects: some ids are not "
+                                    "covered by the shards or alphabet")
+
+    def list_changed_since(self, since: datetime, prefix: str = "",
+                           prefetch: int = 1) -> Iterator[ObjectListItem]:
+        """lists objects whose head version was created at or after since (a
+        naive datetime is taken to be UTC). The listing is filtered before
+        any models are built.
+        """
+        cutoff = columnar.datetime_nanos(since)
+        for obj in self.list_objects(prefix=prefix, prefetch=prefetch, raw=True):
+            if columnar.timestamp_nanos(obj.head_created) >= cutoff:
+                yield self.models.object_list_item(obj)
+
+    def changes(self, snapshot: str, prefix: str = "", fetch_state: bool = False,
+                recursive: bool = False, concurrency: int = DEFAULT_CONCURRENCY,
+                prefetch: int = 1) -> Iterator[Change]:
+        """compares a listing of objects with ids beginning with prefix to the
+        snapshot file from the previous run (see ocflindex.sync), yielding a
+        Change for each added, updated or removed object. The listing and
+        snapshot are compared as sorted streams, so memory use does not grow
+        with the size of the repository. A new snapshot is written as the
+        listing is read and replaces the old one once every change has been
+        consumed; if iteration stops early, the old snapshot is kept. Use the
+        same prefix on every run with the same snapshot file.
+
+        If fetch_state is True, the state of the new head version of each
+        added or updated object is fetched (concurrency at a time) and set
+        as Change.state.
+        """
+        writer = SnapshotWriter(snapshot)
+
+        def current() -> Iterator[SnapshotEntry]:
+            fields = ("object_id", "head", "head_created")
+            for object_id, head, created in self.list_objects(prefix=prefix, prefetch=prefetch, fields=fields):
+                entry = SnapshotEntry(object_id, head, columnar.timestamp_nanos(created))
+                writer.write(entry)
+                yield entry
+
+        def with_state(change: Change) -> Change:
+            if change.new is None:
+                return change
+            state = self.get_object_state(change.object_id, version=change.new.head, recursive=recursive)
+            return change._replace(state=state)
+
+        try:
+            changes = diff_snapshots(read_snapshot(snapshot), current())
+            if not fetch_state:
+                yield from changes
+            else:
+                for _, change, err in bulk.fan_out(with_state, changes, concurrency):
+                    if err is not None:
+                        raise err
+                    yield change
+            writer.commit()
+        finally:
+            writer.close()
+
+    def __builders(self, raw: bool = False, fields: Optional[Sequence[str]] = None) -> Builders:
+        models = RAW if raw else self.models
+        if fields:
+            proj = projection(fields)
+            models = models._replace(object_state_child=proj, object_list_item=proj)
+        return models
+
+    def __memoizes(self, changing: bool) -> bool:
+        # results that can change on the server are only memoized if they
+        # expire
+        return self.memo is not None and (not changing or self.memo.ttl is not None)
+
+    def content_stream(self, digest: str, digest_algorithm: Optional[str] = None, **kwargs) -> Iterator[bytes]:
+        """makes a request to download the content with the given digest, returning
+        an iterator over the response data. With a blob cache, cached content is
+        read from disk and downloaded content is added to the cache once it has
+        been read completely and verified with digest_algorithm (by default, the
+        cache's).
+        """
+        writer = None
+        if self.blobs is not None:
+            cached = self.blobs.stream(digest, digest_algorithm, kwargs.get("chunk_size") or 1 << 16)
+            if cached is not None:
+                yield from cached
+                return
+            writer = self.blobs.writer(digest, digest_algorithm)
+        complete = False
+        nbytes = 0
+        start = time.perf_counter()
+        try:
+            for b in stream_url(self.session, f"{self.download_base_url}/download/{digest}",
+                                self.retry, **kwargs):
+                if writer is not None:
+                    writer.write(b)
+                nbytes += len(b)
+                yield b
+            complete = True
+        finally:
+            if self.metrics is not None:
+                self.metrics.transfer(nbytes, time.perf_counter() - start)
+            if writer is not None:
+                if complete:
+                    writer.commit()
+                else:
+                    writer.discard()
+
+    def download(self, digest: str, dest: str, digest_algorithm: str = "sha512",
+                 parts: int = DEFAULT_PARTS,
+                 part_size: int = DEFAULT_PART_SIZE,
+                 use_mmap: bool = False) -> int:
+        """downloads the content with the given digest to the file dest,
+        using up to parts concurrent HTTP range requests. Interrupted
+        downloads resume from the completed ranges. The file is verified with
+        digest_algorithm (see Object.digest_algorithm) before it is moved to
+        dest. Returns the size of the file. With a blob cache, cached content
+        is copied to dest and downloaded content is added to the cache.
+        """
+        if self.blobs is not None and self.blobs.copy_to(digest, dest, digest_algorithm):
+            return os.path.getsize(dest)
+        start = time.perf_counter()
+        size = download_url(self.session, f"{self.download_base_url}/download/{digest}", dest,
+                            digest, digest_algorithm=digest_algorithm, parts=parts,
+                            part_size=part_size, use_mmap=use_mmap, retry=self.retry)
+        if self.metrics is not None:
+            self.metrics.transfer(size, time.perf_counter() - start)
+        if self.blobs is not None:
+            self.blobs.put_file(digest, dest, digest_algorithm)
+        return size
+
+    def export_version(self, object_id: str, version: str, dest: str,
+                       jobs: int = DEFAULT_CONCURRENCY, parts: int = 1,
+                       link: bool = True) -> ExportResult:
+        """writes the files in the state of the object version (or the head
+        version, if version is "") to the directory dest. Each distinct digest
+        is downloaded once, using jobs concurrent downloads of up to parts
+        ranges each, and verified with the object's digest algorithm. Other
+        files with the same digest are hard linked to it (or copied, if link
+        is False or linking fails). Files that already exist with the right
+        digest are skipped, so an interrupted export can be re-run. Digests
+        that could not be exported are reported in the result's errors.
+        """
+        return export_version(self, object_id, version, dest, jobs=jobs, parts=parts, link=link)
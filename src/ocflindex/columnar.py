@@ -0,0 +1,225 @@
+"""Columnar batches of ListObjects and GetObjectState results. Each batch
+holds one page of results as columns: strings are lists and numeric fields
+are contiguous array.array buffers (timestamps are int64 nanoseconds since
+the epoch, UTC). Arrow conversion and the Parquet/IPC writers require
+pyarrow (pip install ocflindex[arrow]).
+"""
+import csv
+import json
+
+from array import array
+from datetime import datetime, timedelta, timezone
+from ocfl.v1 import index_pb2 as pb2
+from typing import Any, Iterable, Iterator, Sequence, TextIO, Union
+
+# column name -> arrow type name, in column order
+OBJECT_LIST_SCHEMA = {
+    "object_id": "string",
+    "head": "string",
+    "v1_created": "timestamp",
+    "head_created": "timestamp",
+}
+
+OBJECT_STATE_SCHEMA = {
+    "name": "string",
+    "digest": "string",
+    "isdir": "bool",
+    "size": "int64",
+}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class ColumnBatch:
+    """A page of results stored by column. Boolean columns are stored as
+    int8 arrays (the buffer used for Arrow conversion); rows and to_pydict
+    return their values as bool.
+    """
+    def __init__(self, schema: dict[str, str], columns: dict[str, Sequence]) -> None:
+        self.schema = schema
+        self.columns = columns
+
+    @property
+    def num_rows(self) -> int:
+        for col in self.columns.values():
+            return len(col)
+        return 0
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __getitem__(self, name: str) -> Sequence:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[tuple]:
+        return zip(*(_values(self.schema[name], self.columns[name]) for name in self.schema))
+
+    def to_pydict(self) -> dict[str, list]:
+        return {name: list(_values(self.schema[name], col)) for name, col in self.columns.items()}
+
+    def to_arrow(self) -> Any:
+        """returns the batch as a pyarrow.RecordBatch"""
+        pa = _pyarrow()
+        arrays = [_arrow_array(pa, self.schema[name], self.columns[name]) for name in self.schema]
+        return pa.RecordBatch.from_arrays(arrays, schema=_arrow_schema(pa, self.schema))
+
+
+def object_list_batch(resp: pb2.ListObjectsResponse) -> ColumnBatch:
+    objects = resp.objects
+    return ColumnBatch(OBJECT_LIST_SCHEMA, {
+        "object_id": [o.object_id for o in objects],
+        "head": [o.head for o in objects],
+        "v1_created": array("q", [timestamp_nanos(o.v1_created) for o in objects]),
+        "head_created": array("q", [timestamp_nanos(o.head_created) for o in objects]),
+    })
+
+
+def object_state_batch(resp: pb2.GetObjectStateResponse) -> ColumnBatch:
+    children = resp.children
+    return ColumnBatch(OBJECT_STATE_SCHEMA, {
+        "name": [ch.name for ch in children],
+        "digest": [ch.digest for ch in children],
+        "isdir": array("b", [ch.isdir for ch in children]),
+        "size": array("q", [ch.size for ch in children]),
+    })
+
+
+def write_csv(batches: Iterable[ColumnBatch], out: Union[str, TextIO]) -> int:
+    """writes batches to out (a path or text file) as CSV with a header row.
+    Timestamps are written in ISO 8601 format. Returns the number of rows
+    written.
+    """
+    if isinstance(out, str):
+        with open(out, "w", newline="") as f:
+            return write_csv(batches, f)
+    writer = csv.writer(out)
+    rows = 0
+    header = False
+    for batch in batches:
+        if not header:
+            writer.writerow(batch.schema)
+            header = True
+        stamps = [i for i, t in enumerate(batch.schema.values()) if t == "timestamp"]
+        for row in batch.rows():
+            if stamps:
+                row = list(row)
+                for i in stamps:
+                    row[i] = _isoformat(row[i])
+            writer.writerow(row)
+        rows += batch.num_rows
+    return rows
+
+
+def write_ndjson(batches: Iterable[ColumnBatch], out: Union[str, TextIO]) -> int:
+    """writes batches to out (a path or text file) as newline-delimited JSON,
+    one object per row. Timestamps are written in ISO 8601 format. Returns
+    the number of rows written.
+    """
+    if isinstance(out, str):
+        with open(out, "w") as f:
+            return write_ndjson(batches, f)
+    rows = 0
+    for batch in batches:
+        names = list(batch.schema)
+        convert = [_json_value(t) for t in batch.schema.values()]
+        out.writelines(
+            json.dumps({n: c(v) for n, c, v in zip(names, convert, row)}, ensure_ascii=False) + "\n"
+            for row in batch.rows())
+        rows += batch.num_rows
+    return rows
+
+
+def write_parquet(batches: Iterable[ColumnBatch], path: str) -> int:
+    """writes batches to a Parquet file at path. Returns the number of rows
+    written.
+    """
+    _pyarrow()
+    import pyarrow.parquet as pq
+    return _write_arrow(batches, lambda schema: pq.ParquetWriter(path, schema))
+
+
+def write_ipc(batches: Iterable[ColumnBatch], path: str) -> int:
+    """writes batches to an Arrow IPC file at path. Returns the number of
+    rows written.
+    """
+    pa = _pyarrow()
+    return _write_arrow(batches, lambda schema: pa.ipc.new_file(path, schema))
+
+
+def _write_arrow(batches: Iterable[ColumnBatch], open_writer) -> int:
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            record = batch.to_arrow()
+            if writer is None:
+                writer = open_writer(record.schema)
+            writer.write_batch(record)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def timestamp_nanos(ts: Any) -> int:
+    """returns a protobuf Timestamp as nanoseconds since the epoch, the
+    form of timestamp columns and snapshot entries.
+    """
+    return ts.seconds * 1_000_000_000 + ts.nanos
+
+
+def datetime_nanos(dt: datetime) -> int:
+    """returns dt (taken to be UTC if naive) as nanoseconds since the epoch
+    """
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+def _isoformat(nanos: int) -> str:
+    return (_EPOCH + timedelta(microseconds=nanos // 1000)).isoformat() + "Z"
+
+
+def _json_value(t: str) -> Any:
+    if t == "timestamp":
+        return _isoformat
+    return lambda v: v
+
+
+def _values(t: str, col: Sequence) -> Iterable:
+    # the column's values as python values
+    if t == "bool":
+        return map(bool, col)
+    return col
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError("arrow conversion requires pyarrow: pip install ocflindex[arrow]") from err
+    return pyarrow
+
+
+def _arrow_schema(pa: Any, schema: dict[str, str]) -> Any:
+    return pa.schema([(name, _arrow_type(pa, t)) for name, t in schema.items()])
+
+
+def _arrow_type(pa: Any, t: str) -> Any:
+    if t == "timestamp":
+        return pa.timestamp("ns", tz="UTC")
+    if t == "bool":
+        return pa.bool_()
+    return getattr(pa, t)()
+
+
+def _arrow_array(pa: Any, t: str, col: Sequence) -> Any:
+    if isinstance(col, array):
+        # wrap the array's buffer without copying; booleans are stored as
+        # int8 and cast.
+        typ = pa.int8() if t == "bool" else _arrow_type(pa, t)
+        arr = pa.Array.from_buffers(typ, len(col), [None, pa.py_buffer(col)])
+        return arr.cast(pa.bool_()) if t == "bool" else arr
+    return pa.array(col, type=_arrow_type(pa, t))
@@ -0,0 +1,91 @@
+"""Comparing the states of two object versions.
+"""
+from ocfl.v1 import index_pb2 as pb2
+from typing import Any, Iterator, NamedTuple, Optional
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+
+
+class FileChange(NamedTuple):
+    """A file that differs between two versions. path is relative to the
+    object root. old is None for added files and new is None for removed
+    files.
+    """
+    kind: str
+    path: str
+    old: Optional[Any]
+    new: Optional[Any]
+
+
+def diff_versions(client: Any, object_id: str, v_a: str, v_b: str,
+                  path: str = ".") -> Iterator[FileChange]:
+    """See Client.diff_versions."""
+    a = client.get_object_state(object_id, path=path, version=v_a, raw=True)
+    b = client.get_object_state(object_id, path=path, version=v_b, raw=True)
+    if a.digest == b.digest:
+        return
+    if not (a.isdir and b.isdir):
+        # path is a file in at least one version
+        yield from _replaced(client, object_id, v_a, v_b, path, a, b)
+        return
+    yield from _diff_dir(client, object_id, v_a, v_b, path, a, b)
+
+
+def _diff_dir(client: Any, object_id: str, v_a: str, v_b: str, path: str,
+              a: pb2.GetObjectStateResponse, b: pb2.GetObjectStateResponse) -> Iterator[FileChange]:
+    build = client.models.object_state_child
+    a_children = {ch.name: ch for ch in a.children}
+    b_children = {ch.name: ch for ch in b.children}
+    for name in sorted(a_children.keys() | b_children.keys()):
+        old = a_children.get(name)
+        new = b_children.get(name)
+        child_path = _join(path, name)
+        if new is None:
+            yield from _expand(client, object_id, v_a, child_path, old, REMOVED)
+        elif old is None:
+            yield from _expand(client, object_id, v_b, child_path, new, ADDED)
+        elif old.digest == new.digest and old.isdir == new.isdir:
+            continue
+        elif old.isdir and new.isdir:
+            yield from diff_versions(client, object_id, v_a, v_b, child_path)
+        elif not old.isdir and not new.isdir:
+            yield FileChange(MODIFIED, child_path, build(old), build(new))
+        else:
+            yield from _expand(client, object_id, v_a, child_path, old, REMOVED)
+            yield from _expand(client, object_id, v_b, child_path, new, ADDED)
+
+
+def _replaced(client: Any, object_id: str, v_a: str, v_b: str, path: str,
+              a: pb2.GetObjectStateResponse, b: pb2.GetObjectStateResponse) -> Iterator[FileChange]:
+    build = client.models.object_state_child
+    name = path.rsplit("/", 1)[-1]
+    old = pb2.GetObjectStateResponse.Item(name=name, isdir=a.isdir, size=a.size,
+                                          has_size=a.has_size, digest=a.digest)
+    new = pb2.GetObjectStateResponse.Item(name=name, isdir=b.isdir, size=b.size,
+                                          has_size=b.has_size, digest=b.digest)
+    if not a.isdir and not b.isdir:
+        yield FileChange(MODIFIED, path, build(old), build(new))
+        return
+    yield from _expand(client, object_id, v_a, path, old, REMOVED)
+    yield from _expand(client, object_id, v_b, path, new, ADDED)
+
+
+def _expand(client: Any, object_id: str, version: str, path: str,
+            item: pb2.GetObjectStateResponse.Item, kind: str) -> Iterator[FileChange]:
+    # reports item as added or removed; directories are expanded to the
+    # files they contain.
+    build = client.models.object_state_child
+    if not item.isdir:
+        ch = build(item)
+        yield FileChange(kind, path, ch if kind == REMOVED else None, ch if kind == ADDED else None)
+        return
+    for f in client.iter_object_state(object_id, path=path, version=version, recursive=True, raw=True):
+        ch = build(f)
+        file_path = _join(path, f.name)
+        yield FileChange(kind, file_path, ch if kind == REMOVED else None, ch if kind == ADDED else None)
+
+
+def _join(path: str, name: str) -> str:
+    return name if path in (".", "") else f"{path}/{name}"
@@ -0,0 +1,258 @@
+"""Parallel, resumable downloads using HTTP range requests.
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from ocflindex.retry import RetryPolicy, IncompleteRead
+from typing import Any, Iterator, Optional
+
+# size of each range request
+DEFAULT_PART_SIZE = 8 << 20
+# number of concurrent range requests per download
+DEFAULT_PARTS = 4
+
+_READ_SIZE = 1 << 20
+# ranges refer to the stored bytes, so ask for them unencoded
+_IDENTITY = {"Accept-Encoding": "identity"}
+
+
+class DigestError(Exception):
+    """Downloaded content did not match the expected digest"""
+
+
+def new_hash(digest_algorithm: str) -> Any:
+    """returns a hashlib object for an OCFL digest algorithm name (e.g.,
+    'sha512' or 'blake2b-256').
+    """
+    name = digest_algorithm.lower()
+    if name.startswith("blake2b-"):
+        return hashlib.blake2b(digest_size=int(name.removeprefix("blake2b-")) // 8)
+    return hashlib.new(name)
+
+
+def file_digest(path: str, digest_algorithm: str) -> str:
+    h = new_hash(digest_algorithm)
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(_READ_SIZE)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def download_url(session: Any, url: str, dest: str, digest: str,
+             digest_algorithm: str = "sha512",
+             parts: int = DEFAULT_PARTS,
+             part_size: int = DEFAULT_PART_SIZE,
+             use_mmap: bool = False,
+             chunk_size: int = 1 << 16,
+             retry: Optional[RetryPolicy] = None) -> int:
+    """Downloads url to dest, returning the number of bytes in the file.
+
+    If the server supports range requests, the content is fetched in
+    part_size ranges, up to parts at a time, and written into a preallocated
+    temporary file (dest + '.part'), optionally through a memory map.
+    Completed ranges are recorded in dest + '.part.json' so an interrupted
+    download resumes where it left off. Otherwise the content is fetched in
+    one request, into dest + '.part'; if that file is left from an
+    interrupted download and the server supports ranges, the request asks
+    for the rest of the content. The result is verified against digest
+    before it is moved to dest; on a mismatch, the temporary files are
+    removed and DigestError is raised.
+
+    With a retry policy, failed requests are retried according to the
+    policy; if the server supports ranges, a retried transfer resumes from
+    the last byte received.
+    """
+    if retry is None:
+        retry = RetryPolicy(max_attempts=1, timeout=None)
+    tmp = dest + ".part"
+    progress_path = dest + ".part.json"
+    size, ranges = retry.call(lambda: _probe(session, url, retry.timeout))
+    if size is None or not ranges or size <= part_size:
+        if os.path.exists(progress_path):
+            # tmp was preallocated for range requests
+            _remove(tmp)
+            _remove(progress_path)
+        _fetch_whole(session, url, tmp, size, ranges, chunk_size, retry)
+    else:
+        _fetch_ranges(session, url, tmp, progress_path, size, parts, part_size, use_mmap, chunk_size, retry)
+    got = file_digest(tmp, digest_algorithm)
+    if got != digest.lower():
+        _remove(tmp)
+        _remove(progress_path)
+        raise DigestError(f"{url}: expected {digest_algorithm} {digest}, got {got}")
+    os.replace(tmp, dest)
+    _remove(progress_path)
+    return os.path.getsize(dest)
+
+
+def stream_url(session: Any, url: str, retry: Optional[RetryPolicy] = None,
+               chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """yields the content at url in chunks. With a retry policy, failed
+    requests are retried and a transfer that fails part way through resumes
+    with a range request from the last byte yielded.
+    """
+    if retry is None:
+        retry = RetryPolicy(max_attempts=1, timeout=None)
+    offset = 0
+    attempt = 0
+    while True:
+        headers = dict(_IDENTITY)
+        if offset > 0:
+            headers["Range"] = f"bytes={offset}-"
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=retry.timeout) as r:
+                r.raise_for_status()
+                if offset > 0 and r.status_code != 206:
+                    raise IOError(f"{url}: server ignored range request")
+                expected = _content_length(r)
+                start = offset
+                for b in r.iter_content(chunk_size=chunk_size):
+                    offset += len(b)
+                    yield b
+                if expected is not None and offset - start < expected:
+                    raise IncompleteRead(f"{url}: incomplete response")
+                return
+        except Exception as err:
+            attempt += 1
+            if attempt >= retry.max_attempts or not retry.retryable(err):
+                raise
+        time.sleep(retry.backoff(attempt - 1))
+
+
+def _content_length(r: Any) -> Optional[int]:
+    # the length of the response body, if it is known and not encoded
+    length = r.headers.get("Content-Length")
+    if length is None or r.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    return int(length)
+
+
+def _probe(session: Any, url: str, timeout: Optional[float]) -> tuple[Optional[int], bool]:
+    # returns the content size (if known) and whether ranges are supported
+    with session.head(url, headers=_IDENTITY, allow_redirects=True, timeout=timeout) as r:
+        r.raise_for_status()
+        length = r.headers.get("Content-Length")
+        ranges = r.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return (int(length) if length is not None else None), ranges
+
+
+def _fetch_whole(session: Any, url: str, tmp: str, size: Optional[int], ranges: bool,
+                 chunk_size: int, retry: RetryPolicy) -> None:
+    # with ranges, bytes already in tmp are kept and the rest is requested
+    with open(tmp, "ab" if ranges else "wb") as f:
+        if size is not None and f.tell() >= size:
+            # nothing left to request; start over
+            f.seek(0)
+            f.truncate()
+
+        def fetch() -> None:
+            offset = f.tell()
+            headers = None
+            if offset > 0:
+                if not ranges:
+                    # can't resume: start over
+                    f.seek(0)
+                    f.truncate()
+                else:
+                    headers = {"Range": f"bytes={offset}-", **_IDENTITY}
+            with session.get(url, headers=headers, stream=True, timeout=retry.timeout) as r:
+                r.raise_for_status()
+                if headers is not None and r.status_code != 206:
+                    f.seek(0)
+                    f.truncate()
+                expected = _content_length(r)
+                start = f.tell()
+                for b in r.iter_content(chunk_size=chunk_size):
+                    f.write(b)
+                if expected is not None and f.tell() - start < expected:
+                    raise IncompleteRead(f"{url}: incomplete response")
+
+        retry.call(fetch)
+
+
+def _fetch_ranges(session: Any, url: str, tmp: str, progress_path: str, size: int,
+                  parts: int, part_size: int, use_mmap: bool, chunk_size: int,
+                  retry: RetryPolicy) -> None:
+    done = _load_progress(progress_path, tmp, size, part_size)
+    if not done:
+        with open(tmp, "wb") as f:
+            f.truncate(size)
+    num = (size + part_size - 1) // part_size
+    pending = [i for i in range(num) if i not in done]
+    lock = threading.Lock()
+    fd = os.open(tmp, os.O_RDWR)
+    mm = mmap.mmap(fd, size) if use_mmap else None
+    try:
+        def fetch(i: int) -> None:
+            start = i * part_size
+            end = min(start + part_size, size) - 1
+            # offset of the next byte to write; a retry requests the rest
+            # of the range from here.
+            offset = start
+
+            def fetch_rest() -> None:
+                nonlocal offset
+                headers = {"Range": f"bytes={offset}-{end}", **_IDENTITY}
+                with session.get(url, headers=headers, stream=True, timeout=retry.timeout) as r:
+                    r.raise_for_status()
+                    if r.status_code != 206:
+                        raise IOError(f"{url}: server ignored range request")
+                    for b in r.iter_content(chunk_size=chunk_size):
+                        if offset + len(b) > end + 1:
+                            raise IOError(f"{url}: range response is longer than requested")
+                        if mm is not None:
+                            mm[offset:offset + len(b)] = b
+                        else:
+                            os.pwrite(fd, b, offset)
+                        offset += len(b)
+                if offset != end + 1:
+                    raise IncompleteRead(f"{url}: incomplete range response")
+
+            retry.call(fetch_rest)
+            with lock:
+                done.add(i)
+                _save_progress(progress_path, size, part_size, done)
+
+        with ThreadPoolExecutor(max_workers=max(1, parts)) as pool:
+            for fut in [pool.submit(fetch, i) for i in pending]:
+                fut.result()
+        if mm is not None:
+            mm.flush()
+    finally:
+        if mm is not None:
+            mm.close()
+        os.close(fd)
+
+
+def _load_progress(progress_path: str, tmp: str, size: int, part_size: int) -> set[int]:
+    try:
+        with open(progress_path) as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if (progress.get("size") != size or progress.get("part_size") != part_size
+            or not os.path.exists(tmp) or os.path.getsize(tmp) != size):
+        return set()
+    return set(progress.get("done", []))
+
+
+def _save_progress(progress_path: str, size: int, part_size: int, done: set[int]) -> None:
+    tmp = progress_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"size": size, "part_size": part_size, "done": sorted(done)}, f)
+    os.replace(tmp, progress_path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
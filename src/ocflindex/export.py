@@ -0,0 +1,123 @@
+"""Materializing object versions as local directories.
+"""
+import os
+import shutil
+
+from ocflindex import bulk
+from ocflindex.download import file_digest
+from typing import Any, NamedTuple, Optional
+
+
+class ExportResult(NamedTuple):
+    """Summary of an export_version call. errors maps the digests that could
+    not be exported to the exception that was raised.
+    """
+    files: int
+    downloaded: int
+    linked: int
+    skipped: int
+    bytes_downloaded: int
+    errors: dict[str, BaseException]
+
+
+def export_version(client: Any, object_id: str, version: str, dest: str,
+                   jobs: int = bulk.DEFAULT_CONCURRENCY,
+                   parts: int = 1,
+                   link: bool = True) -> ExportResult:
+    """Writes the files in the object version's state under the directory
+    dest. See Client.export_version.
+    """
+    obj = client.get_object(object_id, raw=True)
+    if version == "" and len(obj.versions) > 0:
+        version = obj.versions[-1].num
+    algorithm = obj.digest_algorithm or "sha512"
+    # digest -> [(path, size)]: each digest is downloaded once. size is
+    # None if the index has no size information.
+    files: dict[str, list[tuple[str, Optional[int]]]] = {}
+    num_files = 0
+    state = client.iter_object_state(object_id, version=version, recursive=True,
+                                     fields=("name", "digest", "size", "has_size"))
+    for name, digest, size, has_size in state:
+        files.setdefault(digest, []).append((_safe_join(dest, name), size if has_size else None))
+        num_files += 1
+
+    def export(digest: str) -> tuple[int, int, int, int]:
+        targets = files[digest]
+        source = None
+        missing = []
+        skipped = 0
+        for path, size in targets:
+            if source is None and _valid(path, size, digest, algorithm):
+                source = path
+                skipped += 1
+            elif source is not None and _same_file(path, source, size, digest, algorithm):
+                skipped += 1
+            else:
+                missing.append(path)
+        downloaded = 0
+        nbytes = 0
+        if source is None:
+            source = missing.pop(0)
+            os.makedirs(os.path.dirname(source), exist_ok=True)
+            nbytes = client.download(digest, source, digest_algorithm=algorithm, parts=parts)
+            downloaded = 1
+        for path in missing:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _link_or_copy(source, path, link)
+        return downloaded, len(missing), skipped, nbytes
+
+    downloaded = linked = skipped = nbytes = 0
+    errors: dict[str, BaseException] = {}
+    for digest, result, err in bulk.fan_out(export, files, jobs, ordered=False):
+        if err is not None:
+            if not isinstance(err, Exception):
+                raise err
+            errors[digest] = err
+            continue
+        downloaded += result[0]
+        linked += result[1]
+        skipped += result[2]
+        nbytes += result[3]
+    return ExportResult(num_files, downloaded, linked, skipped, nbytes, errors)
+
+
+def _safe_join(dest: str, name: str) -> str:
+    parts = name.split("/")
+    if name.startswith("/") or any(p in ("", ".", "..") for p in parts):
+        raise ValueError(f"invalid path in object state: {name!r}")
+    return os.path.join(dest, *parts)
+
+
+def _valid(path: str, size: Optional[int], digest: str, algorithm: str) -> bool:
+    try:
+        if not os.path.isfile(path):
+            return False
+        if size is not None and os.path.getsize(path) != size:
+            return False
+    except OSError:
+        return False
+    return file_digest(path, algorithm) == digest.lower()
+
+
+def _same_file(path: str, source: str, size: Optional[int], digest: str, algorithm: str) -> bool:
+    try:
+        if os.path.samefile(path, source):
+            return True
+    except OSError:
+        return False
+    return _valid(path, size, digest, algorithm)
+
+
+def _link_or_copy(source: str, path: str, link: bool) -> None:
+    tmp = path + ".part"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    if link:
+        try:
+            os.link(source, tmp)
+            os.replace(tmp, path)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, path)
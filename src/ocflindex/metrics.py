@@ -0,0 +1,266 @@
+"""Client instrumentation. A Client created with metrics=recorder reports
+RPC latencies, page sizes, download transfers, model conversion times and
+cache counters to the recorder. Without a recorder (the default), none of
+this is measured.
+
+Stats keeps the measurements in memory; PrometheusRecorder exports them
+with prometheus_client (pip install ocflindex[prometheus]). Other systems
+(e.g., OpenTelemetry) can be supported by subclassing Recorder.
+"""
+import bisect
+import threading
+import time
+
+import grpc
+
+from typing import Any, Optional, Sequence
+
+# upper bounds (seconds) of the RPC latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# upper bounds of the items-per-page histogram buckets
+PAGE_BUCKETS = (1, 10, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Recorder:
+    """Receives measurements from a Client. All methods do nothing;
+    subclasses override the ones they use. Methods may be called from
+    several threads at once.
+    """
+    def rpc(self, method: str, code: grpc.StatusCode, seconds: float) -> None:
+        """an RPC attempt (method is e.g. "GetObject") finished with code
+        after seconds. Retried calls are reported once per attempt.
+        """
+
+    def page(self, method: str, items: int) -> None:
+        """a ListObjects or GetObjectState response held items entries"""
+
+    def transfer(self, nbytes: int, seconds: float) -> None:
+        """a download or content stream moved nbytes in seconds"""
+
+    def conversion(self, kind: str, seconds: float) -> None:
+        """building one model (kind is a models.Builders field) took seconds
+        """
+
+    def watch_cache(self, name: str, cache: Any) -> None:
+        """the client uses cache (with hits and misses attributes) under
+        name, one of "memo", "metadata" or "blobs". The counters are read
+        when they are reported, so lookups cost nothing extra.
+        """
+
+
+class Histogram:
+    """Counts of observations in fixed buckets, with their sum."""
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """estimates the q quantile (0 <= q <= 1) as the upper bound of the
+        bucket it falls in, or None if there are no observations.
+        Observations above the last bucket are reported as its bound.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n > 0:
+                return self.buckets[min(i, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Stats(Recorder):
+    """Records measurements in memory. snapshot() returns them as a dict.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.latency: dict[str, Histogram] = {}
+        self.errors: dict[str, dict[str, int]] = {}
+        self.pages: dict[str, Histogram] = {}
+        self.bytes = 0
+        self.transfer_seconds = 0.0
+        self.transfers = 0
+        self.conversions: dict[str, list] = {}
+        self.caches: dict[str, Any] = {}
+
+    def rpc(self, method: str, code: grpc.StatusCode, seconds: float) -> None:
+        with self.lock:
+            h = self.latency.get(method)
+            if h is None:
+                h = self.latency[method] = Histogram(LATENCY_BUCKETS)
+            h.observe(seconds)
+            if code != grpc.StatusCode.OK:
+                errors = self.errors.setdefault(method, {})
+                errors[code.name] = errors.get(code.name, 0) + 1
+
+    def page(self, method: str, items: int) -> None:
+        with self.lock:
+            h = self.pages.get(method)
+            if h is None:
+                h = self.pages[method] = Histogram(PAGE_BUCKETS)
+            h.observe(items)
+
+    def transfer(self, nbytes: int, seconds: float) -> None:
+        with self.lock:
+            self.bytes += nbytes
+            self.transfer_seconds += seconds
+            self.transfers += 1
+
+    def conversion(self, kind: str, seconds: float) -> None:
+        with self.lock:
+            c = self.conversions.get(kind)
+            if c is None:
+                c = self.conversions[kind] = [0, 0.0]
+            c[0] += 1
+            c[1] += seconds
+
+    def watch_cache(self, name: str, cache: Any) -> None:
+        with self.lock:
+            self.caches[name] = cache
+
+    def snapshot(self) -> dict:
+        """returns the measurements so far. Download throughput is bytes per
+        second of transfer time; with concurrent transfers, the rate seen
+        by the process is higher.
+        """
+        with self.lock:
+            caches = {}
+            for name, cache in self.caches.items():
+                lookups = cache.hits + cache.misses
+                caches[name] = {"hits": cache.hits, "misses": cache.misses,
+                                "hit_rate": cache.hits / lookups if lookups else None}
+            return {
+                "elapsed": time.monotonic() - self.started,
+                "rpc": {m: {**h.to_dict(), "errors": dict(self.errors.get(m, {}))}
+                        for m, h in self.latency.items()},
+                "pages": {m: {"count": h.count, "items": int(h.sum),
+                              "items_per_page": h.sum / h.count if h.count else None}
+                          for m, h in self.pages.items()},
+                "download": {"transfers": self.transfers, "bytes": self.bytes,
+                             "seconds": self.transfer_seconds,
+                             "bytes_per_second": (self.bytes / self.transfer_seconds
+                                                  if self.transfer_seconds else None)},
+                "conversion": {k: {"count": n, "seconds": t} for k, (n, t) in self.conversions.items()},
+                "cache": caches,
+            }
+
+
+class PrometheusRecorder(Recorder):
+    """Exports measurements as Prometheus metrics in registry (by default,
+    prometheus_client's global registry), with names starting with
+    namespace. Requires prometheus_client.
+    """
+    def __init__(self, registry: Any = None, namespace: str = "ocflindex") -> None:
+        try:
+            import prometheus_client as prom
+        except ImportError as err:
+            raise ImportError("PrometheusRecorder requires prometheus_client: pip install ocflindex[prometheus]") from err
+        if registry is None:
+            registry = prom.REGISTRY
+        self.rpc_seconds = prom.Histogram(
+            "rpc_duration_seconds", "Duration of RPC attempts", ["method", "code"],
+            namespace=namespace, buckets=LATENCY_BUCKETS, registry=registry)
+        self.page_items = prom.Histogram(
+            "page_items", "Entries per listing page", ["method"],
+            namespace=namespace, buckets=PAGE_BUCKETS, registry=registry)
+        self.download_bytes = prom.Counter(
+            "download_bytes", "Bytes downloaded", namespace=namespace, registry=registry)
+        self.download_seconds = prom.Counter(
+            "download_seconds", "Time spent downloading", namespace=namespace, registry=registry)
+        self.conversion_seconds = prom.Summary(
+            "conversion_seconds", "Time to build a model from a message", ["kind"],
+            namespace=namespace, registry=registry)
+        self.caches: dict[str, Any] = {}
+        registry.register(_CacheCollector(self.caches, namespace))
+
+    def rpc(self, method: str, code: grpc.StatusCode, seconds: float) -> None:
+        self.rpc_seconds.labels(method, code.name).observe(seconds)
+
+    def page(self, method: str, items: int) -> None:
+        self.page_items.labels(method).observe(items)
+
+    def transfer(self, nbytes: int, seconds: float) -> None:
+        self.download_bytes.inc(nbytes)
+        self.download_seconds.inc(seconds)
+
+    def conversion(self, kind: str, seconds: float) -> None:
+        self.conversion_seconds.labels(kind).observe(seconds)
+
+    def watch_cache(self, name: str, cache: Any) -> None:
+        self.caches[name] = cache
+
+
+class _CacheCollector:
+    # reports cache counters when the registry is scraped
+    def __init__(self, caches: dict[str, Any], namespace: str) -> None:
+        self.caches = caches
+        self.namespace = namespace
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily
+        hits = CounterMetricFamily(f"{self.namespace}_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily(f"{self.namespace}_cache_misses", "Cache misses", labels=["cache"])
+        for name, cache in list(self.caches.items()):
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+        yield hits
+        yield misses
+
+
+class MetricsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """Reports the latency and status of each RPC attempt, and the number of
+    entries in each listing page, to a Recorder.
+    """
+    def __init__(self, recorder: Recorder) -> None:
+        self.recorder = recorder
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = _method_name(client_call_details.method)
+        start = time.perf_counter()
+        call = continuation(client_call_details, request)
+
+        def done(call) -> None:
+            seconds = time.perf_counter() - start
+            code = call.code()
+            self.recorder.rpc(method, code, seconds)
+            if code == grpc.StatusCode.OK:
+                items = _page_items(call.result())
+                if items is not None:
+                    self.recorder.page(method, items)
+
+        call.add_done_callback(done)
+        return call
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        method = _method_name(client_call_details.method)
+        start = time.perf_counter()
+        call = continuation(client_call_details, request)
+        call.add_done_callback(lambda c: self.recorder.rpc(method, c.code(), time.perf_counter() - start))
+        return call
+
+
+def _method_name(method: Any) -> str:
+    if isinstance(method, bytes):
+        method = method.decode()
+    return method.rsplit("/", 1)[-1]
+
+
+def _page_items(resp: Any) -> Optional[int]:
+    if hasattr(resp, "objects"):
+        return len(resp.objects)
+    if hasattr(resp, "children"):
+        return len(resp.children)
+    return None
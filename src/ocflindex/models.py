@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from pydantic.utils import GetterDict
-from datetime import datetime
+from datetime import datetime, timedelta
+from ocflindex.builders import Builders
 from typing import Any, Optional
 
 class Status(BaseModel):
@@ -121,3 +122,83 @@ class ObjectListItem(BaseModel):
     class Config:
         orm_mode = True
         getter_dict = ObjectListItemGetter
+
+
+# Fast-path builders. These build models directly from trusted protobuf
+# messages, skipping from_orm and field validation.
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _datetime(ts: Any) -> datetime:
+    """same result as Timestamp.ToDatetime(): a naive UTC datetime"""
+    return _EPOCH + timedelta(0, ts.seconds, ts.nanos // 1000)
+
+def _construct(cls: Any, **values: Any) -> Any:
+    """A leaner BaseModel.construct: values must include every field of cls.
+    """
+    m = cls.__new__(cls)
+    object.__setattr__(m, "__dict__", values)
+    object.__setattr__(m, "__fields_set__", set(values))
+    return m
+
+def status_from_pb(msg: Any) -> Status:
+    return _construct(Status,
+        status=msg.status,
+        store_root_path=msg.store_root_path,
+        store_spec=msg.store_spec,
+        store_description=msg.store_description,
+        num_object_paths=msg.num_object_paths,
+        num_inventories=msg.num_inventories)
+
+def object_version_from_pb(msg: Any) -> ObjectVersion:
+    return _construct(ObjectVersion,
+        num=msg.num,
+        user=_construct(VersionUser, name=msg.user.name, address=msg.user.address),
+        message=msg.message,
+        created=_datetime(msg.created))
+
+def object_from_pb(msg: Any) -> Object:
+    return _construct(Object,
+        object_id=msg.object_id,
+        spec=msg.spec,
+        root_path=msg.root_path,
+        digest_algorithm=msg.digest_algorithm,
+        versions=[object_version_from_pb(v) for v in msg.versions])
+
+def object_state_child_from_pb(msg: Any) -> ObjectStateChild:
+    return _construct(ObjectStateChild,
+        name=msg.name,
+        digest=msg.digest,
+        isdir=msg.isdir,
+        size=msg.size)
+
+def object_state_from_pb(msg: Any) -> ObjectState:
+    return _construct(ObjectState,
+        digest=msg.digest,
+        name=getattr(msg, "name", "."),
+        isdir=msg.isdir,
+        size=msg.size,
+        children=[object_state_child_from_pb(ch) for ch in msg.children])
+
+def object_list_item_from_pb(msg: Any) -> ObjectListItem:
+    return _construct(ObjectListItem,
+        object_id=msg.object_id,
+        head=msg.head,
+        v1_created=_datetime(msg.v1_created),
+        head_created=_datetime(msg.head_created))
+
+# validated models, built with from_orm
+VALIDATED = Builders(
+    status=Status.from_orm,
+    object=Object.from_orm,
+    object_state=ObjectState.from_orm,
+    object_state_child=ObjectStateChild.from_orm,
+    object_list_item=ObjectListItem.from_orm)
+
+# unvalidated models, built directly from trusted protobuf messages
+FAST = Builders(
+    status=status_from_pb,
+    object=object_from_pb,
+    object_state=object_state_from_pb,
+    object_state_child=object_state_child_from_pb,
+    object_list_item=object_list_item_from_pb)
@@ -0,0 +1,195 @@
+import queue
+import threading
+
+import grpc
+
+from ocfl.v1 import index_pb2 as pb2
+from typing import Any, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+# default number of children requested per GetObjectState page
+DEFAULT_STATE_PAGE_SIZE = 1000
+# upper bound for adaptive page size growth. The server may cap pages below
+# this, in which case the pager settles on the server's size.
+MAX_STATE_PAGE_SIZE = 10000
+
+_DONE = object()
+
+
+def prefetch(pages: Iterator[T], depth: int = 1) -> Iterator[T]:
+    """Consumes the pages iterator in a background thread, keeping up to depth
+    pages buffered ahead of the caller. The thread starts immediately.
+    Exceptions raised while fetching are re-raised in the calling thread. If
+    depth is less than 1, pages is returned as-is.
+    """
+    if depth < 1:
+        return pages
+    return Prefetcher([pages], depth)
+
+
+def interleave(sources: Iterable[Iterator[T]], workers: int, depth: int = 1) -> Iterator[T]:
+    """Like prefetch, but consumes each iterator in sources, with up to
+    workers of them consumed at once by background threads, and yields their
+    pages as they arrive. Up to depth pages are buffered.
+    """
+    return Prefetcher(sources, max(1, depth), workers)
+
+
+class Prefetcher:
+    """Iterator returned by prefetch and interleave. Each of workers threads
+    takes the next iterator from sources and puts its pages in the buffer
+    until sources is exhausted. The threads stop when the Prefetcher is
+    closed or garbage collected.
+    """
+    def __init__(self, sources: Iterable[Iterator[T]], depth: int = 1, workers: int = 1) -> None:
+        self.buf: queue.Queue = queue.Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.done = False
+        self.running = max(1, workers)
+        sources = _Shared(sources)
+        self.threads = [threading.Thread(target=_fetch, args=(sources, self.buf, self.stop), daemon=True)
+                        for _ in range(self.running)]
+        for thread in self.threads:
+            thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> T:
+        while not self.done:
+            page, err = self.buf.get()
+            if page is not _DONE:
+                return page
+            if err is not None:
+                self.close()
+                raise err
+            self.running -= 1
+            if self.running == 0:
+                self.close()
+        raise StopIteration
+
+    def close(self) -> None:
+        self.done = True
+        self.stop.set()
+
+    def __del__(self):
+        self.stop.set()
+
+
+class _Shared:
+    # an iterator that several threads can take items from
+    def __init__(self, items: Iterable) -> None:
+        self.items = iter(items)
+        self.lock = threading.Lock()
+
+    def next(self) -> Any:
+        with self.lock:
+            return next(self.items, _DONE)
+
+
+def _fetch(sources: _Shared, buf: queue.Queue, stop: threading.Event) -> None:
+    # runs in a Prefetcher's thread; it holds no reference to the
+    # Prefetcher so that an abandoned Prefetcher can be collected.
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buf.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        while True:
+            pages = sources.next()
+            if pages is _DONE:
+                break
+            for page in pages:
+                if not put((page, None)):
+                    return
+        put((_DONE, None))
+    except BaseException as err:
+        put((_DONE, err))
+
+
+def list_pages(api, prefix: str = "", page_size: int = 1000,
+               page_token: str = "") -> Iterator[pb2.ListObjectsResponse]:
+    """Yields ListObjectsResponse pages for objects with ids beginning with
+    prefix, starting from page_token.
+    """
+    while True:
+        req = pb2.ListObjectsRequest(page_token=page_token,
+                                     page_size=page_size,
+                                     id_prefix=prefix)
+        resp = api.ListObjects(req)
+        yield resp
+        page_token = resp.next_page_token
+        if page_token == "":
+            return
+
+
+class ObjectStatePager:
+    """Iterates over the GetObjectStateResponse pages for a state query.
+
+    Requests start at page_size children and double after each full page, up
+    to max_page_size. If the server returns a short page with a next page
+    token (or rejects a page size as invalid), the pager stops growing at the
+    server's limit.
+    """
+    def __init__(self, api, req: pb2.GetObjectStateRequest,
+                 page_size: int = DEFAULT_STATE_PAGE_SIZE,
+                 max_page_size: int = MAX_STATE_PAGE_SIZE) -> None:
+        self.api = api
+        self.req = req
+        self.page_size = max(1, page_size)
+        self.max_page_size = max(self.page_size, max_page_size)
+        self.pages = 0
+        self.last_ok = 0
+
+    def __iter__(self) -> Iterator[pb2.GetObjectStateResponse]:
+        req = self._firstRequest()
+        while True:
+            req.page_size = self.page_size
+            try:
+                resp = self.api.GetObjectState(req)
+            except grpc.RpcError as err:
+                if self._shrink(err):
+                    continue
+                raise
+            more = self._advance(req, resp)
+            yield resp
+            if not more:
+                return
+
+    def _firstRequest(self) -> pb2.GetObjectStateRequest:
+        req = pb2.GetObjectStateRequest()
+        req.CopyFrom(self.req)
+        req.page_token = ""
+        return req
+
+    def _advance(self, req: pb2.GetObjectStateRequest, resp: pb2.GetObjectStateResponse) -> bool:
+        """records a successful page and prepares req for the next one.
+        Returns False if resp is the last page.
+        """
+        self.pages += 1
+        self.last_ok = self.page_size
+        if resp.next_page_token == "":
+            return False
+        received = len(resp.children)
+        if received < self.page_size:
+            # short page with more results: the server's maximum
+            self.page_size = self.max_page_size = max(1, received)
+        else:
+            self.page_size = min(self.page_size * 2, self.max_page_size)
+        req.page_token = resp.next_page_token
+        return True
+
+    def _shrink(self, err: grpc.RpcError) -> bool:
+        """handles a server that refuses large pages by falling back to the
+        last size that worked. Returns True if the request should be retried.
+        """
+        if err.code() != grpc.StatusCode.INVALID_ARGUMENT or not 0 < self.last_ok < self.page_size:
+            return False
+        self.page_size = self.max_page_size = self.last_ok
+        return True
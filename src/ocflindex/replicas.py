@@ -0,0 +1,297 @@
+"""Routing calls across several ocfl-index replicas.
+
+A Client created with a list of urls keeps a ReplicaSet. Read RPCs
+(ListObjects, GetObject and GetObjectState) go to the healthy replica with
+the lowest expected latency: a moving average of its response times,
+scaled by the number of its calls in progress. With a HedgePolicy, a read
+that is slower than most recent reads of the same method is also sent to
+the next best replica, and whichever answers first is used. Other RPCs go
+to the first healthy replica in url order.
+
+Replicas are checked with GetStatus in the background. A replica that
+fails a check, or a call with UNAVAILABLE, gets no calls until it passes a
+check (unless no replica is healthy). The pages of a listing can be served
+by different replicas, so the replicas should index the same storage root.
+"""
+import collections
+import functools
+import queue
+import threading
+import time
+
+import grpc
+
+from ocfl.v1 import index_pb2 as pb2
+from ocfl.v1 import index_pb2_grpc as api
+from ocflindex.channels import ChannelPool, PooledStub
+from ocflindex.retry import RetryPolicy
+from typing import Any, Optional, Sequence
+
+# RPCs that any replica can answer
+READ_METHODS = frozenset(["ListObjects", "GetObject", "GetObjectState"])
+# seconds between health checks
+DEFAULT_HEALTH_INTERVAL = 5.0
+# deadline for a health check
+DEFAULT_HEALTH_TIMEOUT = 2.0
+# calls of a method that finish before its hedging delay is recomputed
+_HEDGE_REFRESH = 32
+
+_STREAMING = frozenset(["FollowLogs"])
+
+
+class HedgePolicy:
+    """When to hedge a read RPC. A call that has not finished after the
+    percentile latency of the last window calls of the same method
+    (clamped to min_delay and max_delay seconds) is sent to a second
+    replica as well. The delay is recomputed after every few calls of the
+    method finish. Nothing is hedged until min_samples calls of the
+    method have finished, and hedged calls are limited to budget times
+    the number of reads, so that a uniformly slow cluster doesn't get
+    twice the load.
+    """
+    def __init__(self, percentile: float = 0.95,
+                 min_delay: float = 0.005,
+                 max_delay: float = 1.0,
+                 window: int = 1000,
+                 min_samples: int = 20,
+                 budget: float = 0.1) -> None:
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.budget = budget
+
+    def delay(self, latencies: Sequence[float]) -> Optional[float]:
+        """returns how long to wait before hedging, given recent latencies
+        of the method, or None if there are too few to tell.
+        """
+        if len(latencies) < max(1, self.min_samples):
+            return None
+        ordered = sorted(latencies)
+        q = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+        return min(self.max_delay, max(self.min_delay, q))
+
+
+class Replica:
+    """One ocfl-index server in a ReplicaSet, reached through pool. latency
+    is the moving average of its response times in seconds (None before
+    the first response).
+    """
+    def __init__(self, url: str, pool: ChannelPool) -> None:
+        self.url = url
+        self.pool = pool
+        self.stub = PooledStub(pool) if len(pool.channels) > 1 else pool.stub()
+        # health checks bypass the pool's interceptors
+        self.health_stub = api.IndexServiceStub(pool.channels[0])
+        self.healthy = True
+        self.latency: Optional[float] = None
+        self.inflight = 0
+        self.calls = 0
+        self.errors = 0
+
+    def score(self) -> float:
+        return (self.latency or 0.0) * (self.inflight + 1)
+
+
+class ReplicaSet:
+    """Sends calls to a set of replicas, with retries from retry and
+    hedging from hedge (no hedging if None). Each retry goes to the best
+    replica at the time, so a call that fails on one replica is retried on
+    another. Replicas are health-checked every health_interval seconds
+    (never, if None); decay weights new response times in the latency
+    averages.
+    """
+    def __init__(self, replicas: Sequence[Replica],
+                 retry: Optional[RetryPolicy] = None,
+                 hedge: Optional[HedgePolicy] = None,
+                 health_interval: Optional[float] = DEFAULT_HEALTH_INTERVAL,
+                 health_timeout: float = DEFAULT_HEALTH_TIMEOUT,
+                 decay: float = 0.2) -> None:
+        if len(replicas) == 0:
+            raise ValueError("ReplicaSet requires at least one replica")
+        self.replicas = list(replicas)
+        self.retry = retry
+        self.hedge = hedge
+        self.health_timeout = health_timeout
+        self.decay = decay
+        self.lock = threading.Lock()
+        # recent latencies by method, for hedging
+        self.latencies: dict[str, collections.deque] = {}
+        # hedging delay by method, and the number of latencies recorded
+        # for the method since it was computed
+        self.delays: dict[str, tuple[Optional[float], int]] = {}
+        self.reads = 0
+        self.hedged = 0
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        if health_interval is not None:
+            self.thread = threading.Thread(target=self.__watch, args=(health_interval,),
+                                           name="ocflindex-health", daemon=True)
+            self.thread.start()
+
+    def ranked(self, method: str) -> list[Replica]:
+        """returns the replicas to try for method, best first"""
+        with self.lock:
+            candidates = [r for r in self.replicas if r.healthy] or list(self.replicas)
+            if method in READ_METHODS:
+                candidates.sort(key=lambda r: (r.score(), r.inflight))
+        return candidates
+
+    def call(self, method: str, request: Any, timeout: Optional[float] = None, **kwargs) -> Any:
+        """calls the unary RPC method (e.g., "GetObject") with request"""
+        attempts = 1
+        if self.retry is not None:
+            attempts = self.retry.max_attempts
+            if timeout is None:
+                timeout = self.retry.method_timeout(method)
+        for attempt in range(attempts):
+            ranked = self.ranked(method)
+            try:
+                if method in READ_METHODS:
+                    return self.__read(method, ranked, request, timeout, kwargs)
+                return self.__start(ranked[0], method, request, timeout, kwargs).result()
+            except grpc.RpcError as err:
+                if attempt + 1 >= attempts or not self.retry.retryable(err):
+                    raise
+            time.sleep(self.retry.backoff(attempt))
+
+    def stream(self, method: str) -> Any:
+        """returns the streaming RPC method of the first healthy replica"""
+        return getattr(self.ranked(method)[0].stub, method)
+
+    def check(self) -> None:
+        """checks every replica with GetStatus, waiting for the results"""
+        calls = []
+        for r in self.replicas:
+            fut = r.health_stub.GetStatus.future(pb2.GetStatusRequest(), timeout=self.health_timeout)
+            fut.add_done_callback(functools.partial(self.__checked, r, time.perf_counter()))
+            calls.append(fut)
+        for fut in calls:
+            fut.exception()
+
+    def snapshot(self) -> dict:
+        """returns the state of each replica and hedging counts"""
+        with self.lock:
+            return {
+                "replicas": [{"url": r.url, "healthy": r.healthy, "latency": r.latency,
+                              "inflight": r.inflight, "calls": r.calls, "errors": r.errors}
+                             for r in self.replicas],
+                "reads": self.reads,
+                "hedged": self.hedged,
+            }
+
+    def close(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        for r in self.replicas:
+            r.pool.close()
+
+    def __read(self, method: str, ranked: list[Replica], request: Any,
+               timeout: Optional[float], kwargs: dict) -> Any:
+        delay = None
+        with self.lock:
+            self.reads += 1
+        if self.hedge is not None and len(ranked) > 1:
+            delay = self.__delay(method)
+        if delay is None:
+            return self.__start(ranked[0], method, request, timeout, kwargs).result()
+        done: queue.Queue = queue.Queue()
+        calls = [self.__start(ranked[0], method, request, timeout, kwargs, done)]
+        try:
+            fut = done.get(timeout=delay)
+        except queue.Empty:
+            with self.lock:
+                hedge = self.hedged < self.hedge.budget * self.reads
+                if hedge:
+                    self.hedged += 1
+            if hedge:
+                calls.append(self.__start(ranked[1], method, request, timeout, kwargs, done))
+            fut = done.get()
+            if fut.exception() is not None and len(calls) > 1:
+                # the other call may still succeed
+                other = done.get()
+                if other.exception() is None:
+                    fut = other
+        for call in calls:
+            if call is not fut:
+                call.cancel()
+        return fut.result()
+
+    def __start(self, r: Replica, method: str, request: Any, timeout: Optional[float],
+                kwargs: dict, done: Optional[queue.Queue] = None) -> Any:
+        with self.lock:
+            r.inflight += 1
+            r.calls += 1
+        fut = getattr(r.stub, method).future(request, timeout=timeout, **kwargs)
+        fut.add_done_callback(functools.partial(self.__finished, r, method, time.perf_counter(), done))
+        return fut
+
+    def __finished(self, r: Replica, method: str, start: float, done: Optional[queue.Queue], fut: Any) -> None:
+        seconds = time.perf_counter() - start
+        code = grpc.StatusCode.CANCELLED if fut.cancelled() else fut.code()
+        with self.lock:
+            r.inflight -= 1
+            if code == grpc.StatusCode.UNAVAILABLE:
+                r.healthy = False
+                r.errors += 1
+            else:
+                # a call cancelled by hedging took at least seconds
+                self.__observe(r, seconds)
+                if code != grpc.StatusCode.CANCELLED and self.hedge is not None:
+                    window = self.latencies.get(method)
+                    if window is None:
+                        window = self.latencies[method] = collections.deque(maxlen=self.hedge.window)
+                    window.append(seconds)
+                    delay, age = self.delays.get(method, (None, 0))
+                    self.delays[method] = (delay, age + 1)
+        if done is not None:
+            done.put(fut)
+
+    def __delay(self, method: str) -> Optional[float]:
+        # the hedging delay for method, recomputed from a copy of its
+        # latencies (outside the lock) once enough calls have finished
+        # since the last time
+        with self.lock:
+            delay, age = self.delays.get(method, (None, 0))
+            if age < _HEDGE_REFRESH and (delay is not None or age == 0):
+                return delay
+            self.delays[method] = (delay, 0)
+            latencies = list(self.latencies.get(method, ()))
+        delay = self.hedge.delay(latencies)
+        with self.lock:
+            self.delays[method] = (delay, self.delays[method][1])
+        return delay
+
+    def __checked(self, r: Replica, start: float, fut: Any) -> None:
+        seconds = time.perf_counter() - start
+        with self.lock:
+            r.healthy = fut.code() == grpc.StatusCode.OK
+            if r.healthy:
+                self.__observe(r, seconds)
+
+    def __observe(self, r: Replica, seconds: float) -> None:
+        # callers hold self.lock
+        if r.latency is None:
+            r.latency = seconds
+        else:
+            r.latency += self.decay * (seconds - r.latency)
+
+    def __watch(self, interval: float) -> None:
+        while not self.stopped.is_set():
+            self.check()
+            self.stopped.wait(interval)
+
+
+class ReplicaStub:
+    """Stands in for a service stub, sending each call through a
+    ReplicaSet: stub.GetObject(req) is replicas.call("GetObject", req).
+    """
+    def __init__(self, replicas: ReplicaSet) -> None:
+        self.replicas = replicas
+
+    def __getattr__(self, name: str) -> Any:
+        if name in _STREAMING:
+            return self.replicas.stream(name)
+        return functools.partial(self.replicas.call, name)
@@ -0,0 +1,182 @@
+"""Deadlines and retries for RPCs and downloads.
+"""
+import asyncio
+import collections
+import random
+import sys
+import time
+
+import grpc
+
+from grpc import aio
+from typing import Callable, Iterable, Mapping, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+# status codes that are retried by default. A DEADLINE_EXCEEDED call is
+# retried because the per-call timeout is meant to cut off slow attempts,
+# not to fail the operation.
+RETRYABLE_CODES = frozenset([
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.ABORTED,
+])
+# HTTP status codes of download responses that are retried
+RETRYABLE_HTTP_STATUS = frozenset([408, 429, 500, 502, 503, 504])
+# methods that get no deadline by default: IndexIDs returns only after the
+# objects are indexed, which can take much longer than a query.
+DEFAULT_TIMEOUTS = {"IndexIDs": None}
+
+
+class RetryPolicy:
+    """Deadlines and retries for a Client's unary RPCs and downloads.
+
+    Each RPC attempt gets a deadline of timeout seconds (None for no
+    deadline), unless the method is in timeouts, which maps method names
+    (e.g., "GetObjectState") to their own timeout. Attempts that fail with
+    one of the codes are retried, up to max_attempts attempts in all. Before
+    retry n (from 0), the caller sleeps for a random time between 0 and
+    min(max_backoff, initial_backoff * multiplier ** n) ("full jitter"), so
+    that clients retrying together spread out. Paged listings retry the
+    failed page with the same page token, so they resume where they left
+    off. Downloads use timeout as the read timeout and resume failed
+    transfers from the last byte written.
+    """
+    def __init__(self, max_attempts: int = 5,
+                 timeout: Optional[float] = 60.0,
+                 initial_backoff: float = 0.1,
+                 max_backoff: float = 10.0,
+                 multiplier: float = 2.0,
+                 codes: Iterable[grpc.StatusCode] = RETRYABLE_CODES,
+                 timeouts: Optional[Mapping[str, Optional[float]]] = None) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.timeout = timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.codes = frozenset(codes)
+        self.timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+
+    def backoff(self, retry: int) -> float:
+        """returns the delay before retry number retry (from 0)"""
+        ceiling = min(self.max_backoff, self.initial_backoff * self.multiplier ** retry)
+        return random.uniform(0, ceiling)
+
+    def method_timeout(self, method: Union[str, bytes]) -> Optional[float]:
+        # method is a full name such as '/ocfl.v1.IndexService/GetObject'
+        # (bytes, with grpc.aio)
+        if isinstance(method, bytes):
+            method = method.decode()
+        name = method.rsplit("/", 1)[-1]
+        return self.timeouts.get(name, self.timeout)
+
+    def retryable(self, err: BaseException) -> bool:
+        """reports whether err, from an RPC or a download, should be retried.
+        """
+        if isinstance(err, grpc.RpcError):
+            return err.code() in self.codes
+        return _retryable_http(err)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """calls fn until it returns or raises an error that is not
+        retryable, or max_attempts calls have been made.
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return fn()
+            except Exception as err:
+                if attempt + 1 >= self.max_attempts or not self.retryable(err):
+                    raise
+            time.sleep(self.backoff(attempt))
+        raise AssertionError("unreachable")
+
+    def interceptor(self) -> "RetryInterceptor":
+        return RetryInterceptor(self)
+
+    def aio_interceptor(self) -> "AsyncRetryInterceptor":
+        return AsyncRetryInterceptor(self)
+
+
+# policy used by Client unless another is given
+DEFAULT_RETRY = RetryPolicy()
+
+
+class _CallDetails(collections.namedtuple(
+        "_CallDetails", ("method", "timeout", "metadata", "credentials", "wait_for_ready", "compression")),
+        grpc.ClientCallDetails):
+    pass
+
+
+class _AsyncCallDetails(collections.namedtuple(
+        "_AsyncCallDetails", ("method", "timeout", "metadata", "credentials", "wait_for_ready")),
+        aio.ClientCallDetails):
+    pass
+
+
+class RetryInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """Applies a RetryPolicy to the unary RPCs on a channel (see
+    grpc.intercept_channel). Streaming RPCs are not affected.
+    """
+    def __init__(self, policy: RetryPolicy) -> None:
+        self.policy = policy
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        details = client_call_details
+        if details.timeout is None:
+            details = _CallDetails(details.method, self.policy.method_timeout(details.method),
+                                   details.metadata, details.credentials,
+                                   details.wait_for_ready, details.compression)
+        for attempt in range(self.policy.max_attempts):
+            call = continuation(details, request)
+            err = call.exception()
+            if (err is None or attempt + 1 >= self.policy.max_attempts
+                    or not self.policy.retryable(err)):
+                return call
+            time.sleep(self.policy.backoff(attempt))
+
+
+class AsyncRetryInterceptor(aio.UnaryUnaryClientInterceptor):
+    """grpc.aio counterpart to RetryInterceptor, passed to the channel's
+    interceptors argument.
+    """
+    def __init__(self, policy: RetryPolicy) -> None:
+        self.policy = policy
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        details = client_call_details
+        if details.timeout is None:
+            details = _AsyncCallDetails(details.method, self.policy.method_timeout(details.method),
+                                        details.metadata, details.credentials,
+                                        details.wait_for_ready)
+        for attempt in range(self.policy.max_attempts):
+            call = await continuation(details, request)
+            code = await call.code()
+            if (code == grpc.StatusCode.OK or attempt + 1 >= self.policy.max_attempts
+                    or code not in self.policy.codes):
+                return call
+            await asyncio.sleep(self.policy.backoff(attempt))
+
+
+def _retryable_http(err: BaseException) -> bool:
+    # errors from requests or aiohttp, and incomplete transfers. Neither
+    # library is imported here: an error from one means it is loaded.
+    if isinstance(err, IncompleteRead):
+        return True
+    requests = sys.modules.get("requests")
+    if requests is not None:
+        if isinstance(err, requests.HTTPError):
+            return err.response is not None and err.response.status_code in RETRYABLE_HTTP_STATUS
+        if isinstance(err, (requests.ConnectionError, requests.Timeout,
+                            requests.exceptions.ChunkedEncodingError)):
+            return True
+    aiohttp = sys.modules.get("aiohttp")
+    if aiohttp is not None:
+        if isinstance(err, aiohttp.ClientResponseError):
+            return err.status in RETRYABLE_HTTP_STATUS
+        if isinstance(err, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+            return True
+    return isinstance(err, asyncio.TimeoutError)
+
+
+class IncompleteRead(IOError):
+    """A download response ended before all of its content was received"""
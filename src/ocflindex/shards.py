@@ -0,0 +1,267 @@
+import heapq
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from ocfl.v1 import index_pb2 as pb2
+from ocflindex import paging
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+# characters used to split the id space below a prefix: printable ASCII, in
+# code point order.
+DEFAULT_SHARD_ALPHABET = "".join(chr(c) for c in range(0x20, 0x7f))
+# rounds of splitting without more open shards before split_shards settles
+_MAX_STALLED_ROUNDS = 2
+
+
+class IncompleteListing(Exception):
+    """A sharded listing returned fewer objects than the index holds"""
+
+
+class Shard(NamedTuple):
+    """An id prefix listed as one unit. first is the shard's first
+    ListObjects page, if it has been fetched; if first has no next page
+    token, the shard needs no further calls.
+    """
+    prefix: str
+    first: Optional[pb2.ListObjectsResponse] = None
+
+
+def prefix_shards(prefix: str = "", alphabet: str = DEFAULT_SHARD_ALPHABET) -> list[str]:
+    """Splits the ids beginning with prefix into one shard per character in
+    alphabet. Ids whose next character is not in alphabet are not covered by
+    the returned shards (nor is an id equal to prefix).
+    """
+    return [prefix + c for c in sorted(set(alphabet))]
+
+
+def split_shards(api, prefix: str = "", concurrency: int = 8,
+                 alphabet: str = DEFAULT_SHARD_ALPHABET,
+                 page_size: int = 1000,
+                 probe_concurrency: Optional[int] = None,
+                 stop: Optional[threading.Event] = None) -> list[Shard]:
+    """Splits the ids beginning with prefix into disjoint shards, with at
+    least concurrency shards that have more than one page (if there are
+    enough ids). Shards are found by probing: a prefix's first page is
+    fetched, and if there are more pages the prefix is replaced by longer
+    prefixes, one for each character in alphabet that can follow it.
+    Prefixes that the first page shows to be empty, or to be complete in
+    it, are not probed. Characters seen in probed ids are added to
+    alphabet. The probed pages are kept as the shards' first pages. If stop
+    is set, probing ends and the shards from the last completed round are
+    returned. Up to probe_concurrency probes (default: concurrency) are
+    made at once.
+
+    Each split costs a probe per character in alphabet, so a narrower
+    alphabet (e.g., "0123456789" for numeric ids after prefix) is much
+    cheaper. An id is missed if the character following a split point is
+    neither in alphabet nor seen in a probed page; the default alphabet
+    covers ASCII ids.
+    """
+    chars = set(alphabet)
+    if probe_concurrency is None:
+        probe_concurrency = concurrency
+    with ThreadPoolExecutor(max_workers=max(1, probe_concurrency)) as pool:
+
+        def list_first(p: str) -> Optional[pb2.ListObjectsResponse]:
+            if stop is not None and stop.is_set():
+                return None
+            return api.ListObjects(pb2.ListObjectsRequest(id_prefix=p, page_size=page_size))
+
+        def probe(prefixes: list[str]) -> Optional[list[Shard]]:
+            pages = list(pool.map(list_first, prefixes))
+            if any(page is None for page in pages):
+                return None
+            shards = [Shard(p, page) for p, page in zip(prefixes, pages) if len(page.objects) > 0]
+            for shard in shards:
+                for obj in shard.first.objects:
+                    chars.update(obj.object_id[len(prefix):])
+            return shards
+
+        shards = probe([prefix])
+        if shards is None:
+            return [Shard(prefix)]
+        most = stalled = 0
+        while True:
+            n_open = sum(1 for s in shards if s.first.next_page_token != "")
+            if n_open > most:
+                most, stalled = n_open, 0
+            else:
+                stalled += 1
+            # ids that form chains (e.g., "x", "xx", "xxx", ...) only
+            # split into one open shard per round; stop when splitting
+            # stops helping.
+            if (n_open == 0 or n_open >= concurrency or stalled > _MAX_STALLED_ROUNDS
+                    or (stop is not None and stop.is_set())):
+                return shards
+            ordered_chars = "".join(sorted(chars))
+            next_shards: list[Shard] = []
+            to_probe: list[str] = []
+            for shard in shards:
+                if shard.first.next_page_token == "":
+                    next_shards.append(shard)
+                    continue
+                known, unknown = _split(shard, ordered_chars)
+                next_shards.extend(known)
+                to_probe.extend(unknown)
+            probed = probe(to_probe)
+            if probed is None:
+                return shards
+            shards = sorted(next_shards + probed, key=lambda s: s.prefix)
+
+
+def _split(shard: Shard, alphabet: str) -> tuple[list[Shard], list[str]]:
+    # splits a shard with more than one page into shards that are complete
+    # in its first page and the longer prefixes that must be probed.
+    p = shard.prefix
+    n = len(p)
+    objects = list(shard.first.objects)
+    known: list[Shard] = []
+    if objects[0].object_id == p:
+        # an id equal to the prefix isn't under any longer prefix
+        known.append(_complete(p, objects[:1]))
+        objects = objects[1:]
+    if len(objects) == 0:
+        return known, [p + c for c in alphabet]
+    first, last = objects[0].object_id, objects[-1].object_id
+    # every id under p is >= first, so below the common prefix of first and
+    # last only prefixes that continue after it can hold further ids.
+    d = n
+    while d < min(len(first), len(last)) and first[d] == last[d]:
+        d += 1
+    unknown: list[str] = []
+    for i in range(n, d):
+        unknown.extend(first[:i] + c for c in alphabet if c > first[i])
+    q = first[:d]
+    if len(first) == d:
+        # first is a prefix of last
+        known.append(_complete(first, objects[:1]))
+        objects = objects[1:]
+    if len(objects) == 0:
+        unknown.extend(q + c for c in alphabet)
+        return known, unknown
+    # ids under q sort by their next character; ids for characters before
+    # that of last are all in the page.
+    groups: dict[str, list] = {}
+    for obj in objects:
+        groups.setdefault(obj.object_id[d], []).append(obj)
+    tail = last[d]
+    for c, objs in groups.items():
+        if c < tail:
+            known.append(_complete(q + c, objs))
+    unknown.append(q + tail)
+    unknown.extend(q + c for c in alphabet if c > tail)
+    return known, unknown
+
+
+def _complete(prefix: str, objects: list) -> Shard:
+    return Shard(prefix, pb2.ListObjectsResponse(objects=objects))
+
+
+class _Throttled:
+    """Wraps an IndexServiceStub, limiting concurrent ListObjects calls."""
+    def __init__(self, api, concurrency: int) -> None:
+        self.api = api
+        self.sem = threading.BoundedSemaphore(max(1, concurrency))
+
+    def ListObjects(self, req, **kwargs):
+        with self.sem:
+            return self.api.ListObjects(req, **kwargs)
+
+
+def _exact(api, object_id: str) -> list[pb2.ListObjectsResponse.Object]:
+    # the object whose id is exactly object_id, if any, sorts first in a
+    # listing by that prefix.
+    resp = api.ListObjects(pb2.ListObjectsRequest(id_prefix=object_id, page_size=1))
+    return [obj for obj in resp.objects[:1] if obj.object_id == object_id]
+
+
+def _pages(api, shard: Shard, page_size: int) -> Iterator[pb2.ListObjectsResponse]:
+    if shard.first is None:
+        yield from paging.list_pages(api, shard.prefix, page_size)
+        return
+    yield shard.first
+    if shard.first.next_page_token != "":
+        yield from paging.list_pages(api, shard.prefix, page_size, shard.first.next_page_token)
+
+
+def list_sharded(api, shards: Iterable[Union[str, Shard]], prefix: str = "",
+                 concurrency: int = 8, ordered: bool = True,
+                 page_size: int = 1000,
+                 prefetch: int = 1,
+                 after: Optional[str] = None) -> Iterator[pb2.ListObjectsResponse.Object]:
+    """Lists each id prefix (or Shard) in shards concurrently. If ordered is
+    True, the shard listings are merged into lexicographic order by
+    object_id (and ids listed by more than one shard are yielded once);
+    otherwise objects are yielded as pages arrive. If prefix is not empty
+    and shards are prefixes, an object whose id equals prefix is also
+    included (Shards from split_shards already include it). If after is
+    given, only ids greater than after are listed.
+    """
+    shards = [Shard(s) if isinstance(s, str) else s for s in shards]
+    exact = prefix != "" and any(s.first is None for s in shards)
+    if after is not None:
+        # a shard whose prefix sorts before after, and isn't a prefix of
+        # it, only holds ids before after.
+        shards = [s for s in shards if s.prefix > after or after.startswith(s.prefix)]
+        exact = exact and prefix > after
+    if ordered:
+        throttled = _Throttled(api, concurrency)
+        streams = [_objects(paging.prefetch(_pages(throttled, s, page_size), prefetch))
+                   if s.first is None or s.first.next_page_token != "" else iter(s.first.objects)
+                   for s in shards]
+        if exact:
+            streams.append(iter(_exact(api, prefix)))
+        last = after
+        for obj in heapq.merge(*streams, key=lambda o: o.object_id):
+            if last is not None and obj.object_id <= last:
+                continue
+            last = obj.object_id
+            yield obj
+        return
+    if exact:
+        yield from _exact(api, prefix)
+    sources = (_pages(api, s, page_size) for s in shards)
+    for page in paging.interleave(sources, concurrency, 2 * max(1, concurrency)):
+        for obj in page.objects:
+            if after is None or obj.object_id > after:
+                yield obj
+
+
+def list_adaptive(api, prefix: str = "", concurrency: int = 8, ordered: bool = True,
+                  page_size: int = 1000, prefetch: int = 1,
+                  alphabet: str = DEFAULT_SHARD_ALPHABET,
+                  probe_concurrency: Optional[int] = None) -> Iterator[pb2.ListObjectsResponse.Object]:
+    """Lists the ids beginning with prefix in order, one page at a time,
+    while split_shards looks for shards in the background. Once the shards
+    are found, the rest of the listing is read from them with list_sharded.
+    A listing that ends first is an ordinary sequential listing, so small
+    listings, and those whose shards are costly to find, take little
+    longer than with paging.list_pages.
+    """
+    stop = threading.Event()
+    planner = ThreadPoolExecutor(max_workers=1)
+    plan = planner.submit(split_shards, api, prefix, concurrency, alphabet, page_size,
+                          probe_concurrency, stop)
+    pages = paging.prefetch(paging.list_pages(api, prefix, page_size), prefetch)
+    last = None
+    try:
+        for page in pages:
+            yield from page.objects
+            if len(page.objects) > 0:
+                last = page.objects[-1].object_id
+            if page.next_page_token != "" and plan.done() and plan.exception() is None:
+                break
+        else:
+            return
+    finally:
+        stop.set()
+        planner.shutdown(wait=False)
+        if isinstance(pages, paging.Prefetcher):
+            pages.close()
+    yield from list_sharded(api, plan.result(), concurrency=concurrency, ordered=ordered,
+                            page_size=page_size, prefetch=prefetch, after=last)
+
+
+def _objects(pages: Iterator[pb2.ListObjectsResponse]) -> Iterator[pb2.ListObjectsResponse.Object]:
+    for page in pages:
+        yield from page.objects
@@ -0,0 +1,114 @@
+"""Change detection between repository listings. A snapshot is a gzipped,
+tab-separated file of (object_id, head, head_created) rows sorted by
+object_id, as returned by ListObjects. Snapshots are compared with a merge
+of the two sorted streams, so neither side is loaded into memory.
+"""
+import csv
+import gzip
+import os
+
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+ADDED = "added"
+UPDATED = "updated"
+REMOVED = "removed"
+
+
+class SnapshotEntry(NamedTuple):
+    object_id: str
+    head: str
+    # nanoseconds since the epoch
+    head_created: int
+
+
+class Change(NamedTuple):
+    """A difference between two snapshots. old is None for added objects and
+    new is None for removed objects. state is set by Client.changes if
+    fetch_state is True.
+    """
+    kind: str
+    object_id: str
+    old: Optional[SnapshotEntry]
+    new: Optional[SnapshotEntry]
+    state: Any = None
+
+
+def read_snapshot(path: str) -> Iterator[SnapshotEntry]:
+    """yields the entries in the snapshot file at path. A missing file is
+    an empty snapshot.
+    """
+    try:
+        f = gzip.open(path, "rt", newline="", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for object_id, head, created in csv.reader(f, dialect="excel-tab"):
+            yield SnapshotEntry(object_id, head, int(created))
+
+
+class SnapshotWriter:
+    """Writes a snapshot to a temporary file that replaces path when commit
+    is called. If the writer is closed without commit (or the with block
+    raises), path is left unchanged.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.tmp = path + ".tmp"
+        self.file = gzip.open(self.tmp, "wt", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file, dialect="excel-tab")
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.close()
+
+    def write(self, entry: SnapshotEntry) -> None:
+        self.writer.writerow(entry)
+        self.count += 1
+
+    def commit(self) -> None:
+        self.file.close()
+        os.replace(self.tmp, self.path)
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+def diff_snapshots(old: Iterable[SnapshotEntry], new: Iterable[SnapshotEntry]) -> Iterator[Change]:
+    """compares two snapshot streams, both sorted by object_id, yielding
+    a Change for each object that was added, removed, or has a different
+    head. Raises ValueError if either stream is out of order.
+    """
+    old_it = _ordered(old)
+    new_it = _ordered(new)
+    a = next(old_it, None)
+    b = next(new_it, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a.object_id < b.object_id):
+            yield Change(REMOVED, a.object_id, a, None)
+            a = next(old_it, None)
+        elif a is None or b.object_id < a.object_id:
+            yield Change(ADDED, b.object_id, None, b)
+            b = next(new_it, None)
+        else:
+            if a.head != b.head or a.head_created != b.head_created:
+                yield Change(UPDATED, b.object_id, a, b)
+            a = next(old_it, None)
+            b = next(new_it, None)
+
+
+def _ordered(entries: Iterable[SnapshotEntry]) -> Iterator[SnapshotEntry]:
+    last = None
+    for entry in entries:
+        if last is not None and entry.object_id <= last:
+            raise ValueError(f"snapshot is not sorted by object_id at {entry.object_id!r}")
+        last = entry.object_id
+        yield entry
@@ -0,0 +1,58 @@
+"""Sharded listings against the fake server in benchmarks/fakeserver.py."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+import ocflindex
+from fakeserver import Server
+from ocflindex.shards import IncompleteListing
+
+# ids with a non-ASCII first character, outside of the default alphabet
+IDS = sorted([f"a{i}" for i in range(3000)] + [f"é{i}" for i in range(3000)])
+
+
+@pytest.fixture(scope="module")
+def client():
+    with Server(objects=1, files=1) as srv:
+        srv.fake.ids = IDS
+        with ocflindex.Client(srv.grpc_url, validate=False) as c:
+            yield c
+
+
+def listed(client, **kwargs) -> list:
+    return [obj.object_id for obj in client.list_objects_parallel(raw=True, page_size=50, **kwargs)]
+
+
+def test_requires_shards_or_alphabet(client):
+    with pytest.raises(ValueError):
+        listed(client)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("alphabet", [ocflindex.DEFAULT_SHARD_ALPHABET, "a0123456789"])
+def test_ids_outside_alphabet_are_not_dropped(client, alphabet, ordered):
+    try:
+        got = listed(client, alphabet=alphabet, ordered=ordered)
+    except IncompleteListing:
+        return
+    assert sorted(got) == IDS
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_ids_outside_shards_are_not_dropped(client, ordered):
+    with pytest.raises(IncompleteListing):
+        listed(client, shards=ocflindex.prefix_shards(""), ordered=ordered)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_alphabet_with_non_ascii(client, ordered):
+    got = listed(client, alphabet="aé0123456789", ordered=ordered)
+    assert (got if ordered else sorted(got)) == IDS
+
+
+def test_prefix(client):
+    want = [i for i in IDS if i.startswith("é1")]
+    assert listed(client, prefix="é1", alphabet="0123456789") == want